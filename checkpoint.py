@@ -0,0 +1,75 @@
+# checkpoint.py (v1.0 - 推流会话检查点)
+"""
+推流会话检查点：profiles/<主播>/session.json。
+
+工作进程在推流成功后写入 (直播间ID、推流码ID、拉流地址、FFmpeg pid 与启动时间、
+会话开始时间)，推流结束时删除。FFmpeg 以独立进程组启动并把输出写到
+profiles/<主播>/ffmpeg.log，工作进程或主控台重启时不会连带中断推流；
+重启后的工作进程读取检查点，核对 FFmpeg 仍存活且仍有进度后直接接管。
+
+pid 以进程启动时间核对，依赖 /proc (Linux)，其他平台不支持接管。
+"""
+import json
+import os
+import time
+
+import supervisor
+
+SESSION_FILE_NAME = 'session.json'
+FFMPEG_LOG_NAME = 'ffmpeg.log'
+FFMPEG_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+SUPPORTED = supervisor.HAS_PROC
+
+
+def session_path(profile_path: str) -> str:
+    return os.path.join(profile_path, SESSION_FILE_NAME)
+
+
+def ffmpeg_log_path(profile_path: str) -> str:
+    return os.path.join(profile_path, FFMPEG_LOG_NAME)
+
+
+def save(profile_path: str, state: dict):
+    """原子写入并 fsync，崩溃时不会留下写了一半的检查点。"""
+    state = dict(state, updated=time.time())
+    tmp_path = session_path(profile_path) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, session_path(profile_path))
+
+
+def load(profile_path: str) -> dict | None:
+    try:
+        with open(session_path(profile_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def clear(profile_path: str):
+    try:
+        os.remove(session_path(profile_path))
+    except FileNotFoundError:
+        pass
+
+
+def ffmpeg_alive(state: dict | None) -> bool:
+    return bool(SUPPORTED and state and state.get('ffmpeg_pid')
+                and supervisor.process_alive(state['ffmpeg_pid'], state.get('ffmpeg_start_time')))
+
+
+def load_live(profile_path: str) -> dict | None:
+    """返回 FFmpeg 仍在运行的检查点，否则返回 None。"""
+    state = load(profile_path)
+    return state if ffmpeg_alive(state) else None
+
+
+def seconds_since_progress(profile_path: str) -> float:
+    """距 FFmpeg 最后一次输出 (写入 ffmpeg.log) 的秒数。"""
+    try:
+        return time.time() - os.path.getmtime(ffmpeg_log_path(profile_path))
+    except OSError:
+        return float('inf')
@@ -0,0 +1,527 @@
+# cluster.py (v1.0 - 多节点租约调度版)
+"""
+多节点转播：一个协调器 (coordinator) + 多个工作节点 (worker)。
+
+工作节点向协调器注册并通报自身容量 (推流槽位、上行带宽、CPU)，
+协调器以「可续约租约」的方式把主播分配给节点。节点每隔 lease_ttl/3
+秒发送一次心跳来续约；节点失联后，其租约最多在 lease_ttl 秒后过期，
+再经过 reassign_grace(lease_ttl) 秒的宽限期才改派给其他存活节点。节点在
+租约到期前 fence_margin(lease_ttl) 秒就主动停止推流，宽限期涵盖停止所需
+的时间，因此同一个推流码不会有两个节点同时推流。
+
+协调器重启后，先把租约还给通报仍在运行这些主播的节点，并在一个
+lease_ttl 内不分配其他主播，等所有节点重新注册。
+
+用法 (同一台 Linux 主机上即可测试多节点)：
+  python cluster.py coordinator --port 8765 --lease-ttl 15
+  python cluster.py worker --coordinator http://127.0.0.1:8765 --node-id node-a --slots 4 --bandwidth 20000
+  python cluster.py worker --coordinator http://127.0.0.1:8765 --node-id node-b --slots 4 --dry-run
+  python cluster.py status --coordinator http://127.0.0.1:8765
+
+所有节点需能访问同一份 profiles/ 与 credentials/ (同机或共享储存)。
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from configobj import ConfigObj
+from douyin import parse_bitrate_kbps
+import supervisor
+import checkpoint
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+PROFILES_DIR = os.path.join(script_dir, 'profiles')
+STREAMER_SCRIPT_PATH = os.path.join(script_dir, 'streamer.py')
+
+DEFAULT_LEASE_TTL = 15
+FAILOVER_HISTORY = 50
+HEARTBEAT_TIMEOUT = 5
+STOP_TIMEOUT = 10
+# 节点在租约到期前最多这么多秒主动停止 (心跳请求可能阻塞这么久)
+FENCE_MARGIN = HEARTBEAT_TIMEOUT
+PROFILE_SCAN_INTERVAL = 5
+
+
+def fence_margin(lease_ttl: float) -> float:
+    """节点提前停止的秒数；租约很短时不超过心跳间隔 (lease_ttl/3)，否则会在两次心跳之间就过期。"""
+    return min(FENCE_MARGIN, lease_ttl / 3)
+
+
+def reassign_grace(lease_ttl: float) -> float:
+    """
+    租约过期后再等这么多秒才改派。阻塞中的心跳最多延后停止 HEARTBEAT_TIMEOUT 秒，
+    提前量抵销不了的部分加上停止进程树所需的 STOP_TIMEOUT，再留 2 秒余裕。
+    """
+    return STOP_TIMEOUT + max(0.0, HEARTBEAT_TIMEOUT - fence_margin(lease_ttl)) + 2
+
+
+def log(level: str, message: str):
+    print(f"[{time.strftime('%H:%M:%S')}] [{level.upper()}] {message}")
+    sys.stdout.flush()
+
+
+def discover_profiles(profiles_dir: str, group: str | None = None) -> dict:
+    """返回 {profile_id: 预估码率kbps}，可按分组筛选。"""
+    profiles = {}
+    if not os.path.isdir(profiles_dir): return profiles
+    for profile_id in sorted(os.listdir(profiles_dir)):
+        conf = _load_profile(os.path.join(profiles_dir, profile_id))
+        if conf is None: continue
+        if group and conf.get('Custom', {}).get('group', '默认分组').strip() != group: continue
+        profiles[profile_id] = _profile_kbps(conf)
+    return profiles
+
+
+def _load_profile(profile_path: str) -> ConfigObj | None:
+    config_path = os.path.join(profile_path, 'config.ini')
+    if not os.path.exists(config_path): return None
+    try:
+        return ConfigObj(config_path, encoding='UTF8')
+    except Exception:
+        return None
+
+
+def _profile_kbps(conf: ConfigObj | None) -> int:
+    return parse_bitrate_kbps((conf or {}).get('FFmpeg', {}).get('bitrate', '4000k'))
+
+# ====================================================================
+#                           协调器
+# ====================================================================
+class Coordinator:
+    def __init__(self, profiles_dir: str, lease_ttl: int = DEFAULT_LEASE_TTL, group: str | None = None, max_load: float = 0.9):
+        self.profiles_dir = profiles_dir
+        self.lease_ttl = lease_ttl
+        self.group = group
+        self.max_load = max_load
+        self.reassign_grace = reassign_grace(lease_ttl)
+        self.lock = threading.Lock()
+        self.nodes = {}       # node_id -> 节点容量与负载
+        self.leases = {}      # profile_id -> 租约
+        self.orphans = {}     # profile_id -> 等待改派的资讯 (用于计算故障转移延迟)
+        self.failovers = []   # 最近的故障转移记录
+        self.epoch = 0
+        self.started = time.time()
+        self.desired = discover_profiles(profiles_dir, group)
+        self.desired_at = self.started
+
+    # --- 节点请求 ---
+    def register(self, payload: dict) -> dict:
+        node_id = payload['node_id']
+        with self.lock:
+            now = time.time()
+            self.nodes[node_id] = {
+                'slots': int(payload.get('slots', 1)),
+                'bandwidth_kbps': int(payload.get('bandwidth_kbps', 0)),
+                'cpu_count': int(payload.get('cpu_count') or 1),
+                'load': 0.0, 'used_kbps': 0, 'running': list(payload.get('running', [])),
+                'registered_at': now, 'last_seen': now, 'alive': True,
+            }
+            self._schedule(now)
+        log("INFO", f"节点 {node_id} 已注册: 槽位 {payload.get('slots')}, 带宽 {payload.get('bandwidth_kbps') or '不限'} kbps, CPU {payload.get('cpu_count')}, 运行中 {len(payload.get('running', []))}")
+        return {'lease_ttl': self.lease_ttl}
+
+    def heartbeat(self, payload: dict) -> dict:
+        node_id = payload['node_id']
+        with self.lock:
+            now = time.time()
+            node = self.nodes.get(node_id)
+            if node is None:
+                return {'error': 'unknown_node'}
+            node.update(last_seen=now, alive=True, load=float(payload.get('load', 0.0)), used_kbps=int(payload.get('used_kbps', 0)), running=list(payload.get('running', [])))
+            running = set(node['running'])
+            for profile_id, lease in self.leases.items():
+                if lease['node_id'] != node_id: continue
+                lease['expires'] = now + self.lease_ttl
+                if profile_id in running and not lease['confirmed']:
+                    lease['confirmed'] = True
+                    self._record_failover(profile_id, node_id, now)
+            self._schedule(now)
+            leases = {pid: {'epoch': l['epoch'], 'expires_in': l['expires'] - now} for pid, l in self.leases.items() if l['node_id'] == node_id}
+        return {'leases': leases, 'lease_ttl': self.lease_ttl}
+
+    def deregister(self, payload: dict) -> dict:
+        node_id = payload['node_id']
+        with self.lock:
+            now = time.time()
+            released = [pid for pid, l in self.leases.items() if l['node_id'] == node_id]
+            for pid in released:
+                del self.leases[pid]
+                self.orphans[pid] = {'since': now, 'from': node_id, 'reason': 'released'}
+            self.nodes.pop(node_id, None)
+            self._schedule(now)
+        log("INFO", f"节点 {node_id} 已主动离线，释放 {len(released)} 个租约。")
+        return {'released': released}
+
+    # --- 调度 ---
+    def tick(self):
+        now = time.time()
+        if now - self.desired_at >= PROFILE_SCAN_INTERVAL:
+            # 在锁外读取各主播的 config.ini，心跳不必等待磁碟 IO
+            desired = discover_profiles(self.profiles_dir, self.group)
+            with self.lock:
+                self.desired, self.desired_at = desired, now
+        with self.lock:
+            self._schedule(time.time())
+
+    def _schedule(self, now: float):
+        for node_id, node in list(self.nodes.items()):
+            if node['alive'] and now - node['last_seen'] > self.lease_ttl:
+                node['alive'] = False; node['running'] = []
+                log("WARN", f"节点 {node_id} 已 {now - node['last_seen']:.1f} 秒无心跳，标记为失联。")
+            elif now - node['last_seen'] > self.lease_ttl * 4:
+                del self.nodes[node_id]
+        for profile_id, lease in list(self.leases.items()):
+            if lease['expires'] + self.reassign_grace < now:
+                node = self.nodes.get(lease['node_id'])
+                since = node['last_seen'] if node else lease['expires'] - self.lease_ttl
+                self.orphans[profile_id] = {'since': since, 'from': lease['node_id'], 'reason': 'expired'}
+                del self.leases[profile_id]
+                log("WARN", f"主播 {profile_id} 在节点 {lease['node_id']} 上的租约已过期，准备改派。")
+
+        desired = self.desired
+        for profile_id in list(self.leases):
+            if profile_id not in desired:
+                del self.leases[profile_id]
+                self.orphans.pop(profile_id, None)
+        # 没有租约但某个节点仍在运行的主播 (例如协调器刚重启)，把租约还给该节点，不打断推流
+        for node_id, node in self.nodes.items():
+            if not node['alive']: continue
+            for profile_id in node['running']:
+                if profile_id not in desired or profile_id in self.leases: continue
+                self.epoch += 1
+                self.leases[profile_id] = {'node_id': node_id, 'epoch': self.epoch, 'kbps': desired[profile_id], 'granted_at': now, 'expires': now + self.lease_ttl, 'confirmed': True}
+                self.orphans.pop(profile_id, None)
+                log("INFO", f"节点 {node_id} 仍在运行主播 {profile_id}，沿用 (租约 #{self.epoch})。")
+        if now - self.started < self.lease_ttl: return  # 刚启动时先等各节点重新注册并通报运行中的主播
+        for profile_id, kbps in desired.items():
+            if profile_id in self.leases: continue
+            node_id = self._pick_node(kbps)
+            if node_id is None: continue
+            self.epoch += 1
+            self.leases[profile_id] = {'node_id': node_id, 'epoch': self.epoch, 'kbps': kbps, 'granted_at': now, 'expires': now + self.lease_ttl, 'confirmed': False}
+            log("INFO", f"已将主播 {profile_id} 分配给节点 {node_id} (租约 #{self.epoch})。")
+
+    def _node_usage(self, node_id: str) -> tuple[int, int]:
+        slots = kbps = 0
+        for lease in self.leases.values():
+            if lease['node_id'] == node_id:
+                slots += 1; kbps += lease['kbps']
+        return slots, kbps
+
+    def _pick_node(self, kbps: int) -> str | None:
+        best, best_ratio = None, None
+        for node_id, node in self.nodes.items():
+            if not node['alive']: continue
+            used_slots, used_kbps = self._node_usage(node_id)
+            if used_slots >= node['slots']: continue
+            if node['bandwidth_kbps'] and used_kbps + kbps > node['bandwidth_kbps']: continue
+            if node['load'] / node['cpu_count'] > self.max_load: continue
+            ratio = max((used_slots + 1) / node['slots'], (used_kbps + kbps) / node['bandwidth_kbps'] if node['bandwidth_kbps'] else 0.0)
+            if best_ratio is None or ratio < best_ratio:
+                best, best_ratio = node_id, ratio
+        return best
+
+    def _record_failover(self, profile_id: str, node_id: str, now: float):
+        orphan = self.orphans.pop(profile_id, None)
+        if not orphan: return
+        latency = now - orphan['since']
+        self.failovers.append({'profile_id': profile_id, 'from': orphan['from'], 'to': node_id, 'reason': orphan['reason'], 'latency': round(latency, 2), 'at': now})
+        del self.failovers[:-FAILOVER_HISTORY]
+        log("INFO", f"🔁 主播 {profile_id} 已由 {orphan['from']} 转移至 {node_id}，故障转移耗时 {latency:.1f} 秒。")
+
+    # --- 报告 ---
+    def status(self) -> dict:
+        with self.lock:
+            now = time.time()
+            nodes = {}
+            for node_id, node in self.nodes.items():
+                used_slots, used_kbps = self._node_usage(node_id)
+                nodes[node_id] = {
+                    'alive': node['alive'], 'last_seen_ago': round(now - node['last_seen'], 1),
+                    'slots': node['slots'], 'used_slots': used_slots,
+                    'bandwidth_kbps': node['bandwidth_kbps'], 'leased_kbps': used_kbps, 'reported_kbps': node['used_kbps'],
+                    'cpu_count': node['cpu_count'], 'load': node['load'], 'running': node['running'],
+                }
+            latencies = [f['latency'] for f in self.failovers]
+            return {
+                'lease_ttl': self.lease_ttl,
+                'nodes': nodes,
+                'leases': {pid: {'node_id': l['node_id'], 'epoch': l['epoch'], 'confirmed': l['confirmed'], 'expires_in': round(l['expires'] - now, 1)} for pid, l in self.leases.items()},
+                'unassigned': sorted(self.orphans),
+                'failover': {
+                    'count': len(latencies),
+                    'avg_latency': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                    'max_latency': max(latencies) if latencies else None,
+                    'recent': self.failovers[-10:],
+                },
+            }
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    coordinator: Coordinator = None
+
+    def _reply(self, code: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/status': self._reply(200, self.coordinator.status())
+        else: self._reply(404, {'error': 'not_found'})
+
+    def do_POST(self):
+        routes = {'/register': self.coordinator.register, '/heartbeat': self.coordinator.heartbeat, '/deregister': self.coordinator.deregister}
+        handler = routes.get(self.path)
+        if handler is None: self._reply(404, {'error': 'not_found'}); return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            self._reply(200, handler(payload))
+        except Exception as e:
+            self._reply(400, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_coordinator(args):
+    coordinator = Coordinator(args.profiles_dir, lease_ttl=args.lease_ttl, group=args.group, max_load=args.max_load)
+    handler = type('Handler', (_CoordinatorHandler,), {'coordinator': coordinator})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log("INFO", f"协调器已启动: http://{args.host}:{args.port} (租约 {args.lease_ttl} 秒，改派宽限 {coordinator.reassign_grace:g} 秒)")
+    last_report = 0
+    try:
+        while True:
+            time.sleep(1)
+            coordinator.tick()
+            if args.report_interval and time.time() - last_report >= args.report_interval:
+                last_report = time.time()
+                print_status(coordinator.status())
+    except KeyboardInterrupt:
+        log("INFO", "协调器正在关闭...")
+    finally:
+        server.shutdown()
+
+# ====================================================================
+#                           工作节点
+# ====================================================================
+def _post(url: str, payload: dict, timeout: float = HEARTBEAT_TIMEOUT) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+class WorkerNode:
+    def __init__(self, coordinator_url: str, node_id: str, slots: int, bandwidth_kbps: int, profiles_dir: str, dry_run: bool = False):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.node_id = node_id
+        self.slots = slots
+        self.bandwidth_kbps = bandwidth_kbps
+        self.profiles_dir = profiles_dir
+        self.dry_run = dry_run
+        self.lease_ttl = DEFAULT_LEASE_TTL
+        self.processes = {}      # profile_id -> Popen (dry-run 时为 None)
+        self.markers = {}        # profile_id -> 进程树标记
+        self.kbps = {}           # profile_id -> 启动时读取的预估码率，心跳时不必重读 config.ini
+        self.lease_expiry = {}   # profile_id -> 本地计算的租约到期时间
+        self.is_running = True
+
+    def register(self):
+        while self.is_running:
+            try:
+                reply = _post(f"{self.coordinator_url}/register", {'node_id': self.node_id, 'slots': self.slots, 'bandwidth_kbps': self.bandwidth_kbps, 'cpu_count': os.cpu_count(), 'running': sorted(self.processes)})
+                self.lease_ttl = reply.get('lease_ttl', self.lease_ttl)
+                log("INFO", f"节点 {self.node_id} 已向协调器注册 (租约 {self.lease_ttl} 秒)。")
+                return
+            except Exception as e:
+                log("WARN", f"注册失败，3 秒后重试: {e}")
+                time.sleep(3)
+
+    def run(self):
+        self.register()
+        while self.is_running:
+            next_heartbeat = time.time() + self.lease_ttl / 3
+            self._heartbeat()
+            # 心跳之间也持续检查租约，不必等到下一次心跳才发现过期
+            while True:
+                self._fence_expired()
+                if not self.is_running or time.time() >= next_heartbeat: break
+                time.sleep(0.5)
+        self.shutdown()
+
+    def _heartbeat(self, retry: bool = True):
+        self._reap_exited()
+        running = sorted(self.processes)
+        used_kbps = sum(self.kbps.get(pid, 0) for pid in running)
+        load = os.getloadavg()[0] if hasattr(os, 'getloadavg') else 0.0
+        try:
+            sent_at = time.time()
+            reply = _post(f"{self.coordinator_url}/heartbeat", {'node_id': self.node_id, 'running': running, 'used_kbps': used_kbps, 'load': load})
+        except Exception as e:
+            log("WARN", f"心跳失败: {e}")
+            return
+        if reply.get('error') == 'unknown_node':
+            log("WARN", "协调器不认识本节点 (可能已重启)，重新注册。")
+            self.register()
+            if retry: self._heartbeat(retry=False)  # 立即取回租约，避免运行中的主播因租约到期被停止
+            return
+        self.lease_ttl = reply.get('lease_ttl', self.lease_ttl)
+        leases = reply.get('leases', {})
+        for profile_id, lease in leases.items():
+            # 以发送时间为基准，保守地估计本地租约到期时间，并提前 fence_margin 秒停止
+            self.lease_expiry[profile_id] = sent_at + lease['expires_in'] - fence_margin(self.lease_ttl)
+            if profile_id not in self.processes: self._start_profile(profile_id)
+        for profile_id in list(self.processes):
+            if profile_id not in leases:
+                log("INFO", f"主播 {profile_id} 的租约已被收回，停止本地推流。")
+                self._stop_profile(profile_id)
+
+    def _fence_expired(self):
+        # 无法续约时主动停止，避免与接手节点同时推流到同一个推流码
+        now = time.time()
+        for profile_id in list(self.processes):
+            if self.lease_expiry.get(profile_id, 0) < now:
+                log("WARN", f"主播 {profile_id} 的租约未能续约，即将过期，主动停止。")
+                self._stop_profile(profile_id)
+
+    def _start_profile(self, profile_id: str):
+        profile_path = os.path.join(self.profiles_dir, profile_id)
+        self.kbps[profile_id] = _profile_kbps(_load_profile(profile_path))
+        if self.dry_run:
+            self.processes[profile_id] = None
+            log("INFO", f"[dry-run] 已接手主播 {profile_id}。")
+            return
+        marker = supervisor.new_marker()
+        try:
+            process = subprocess.Popen([sys.executable, "-u", STREAMER_SCRIPT_PATH, profile_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='ignore', env=supervisor.worker_env(marker), **supervisor.popen_kwargs())
+        except Exception as e:
+            log("ERROR", f"启动主播 {profile_id} 失败: {e}")
+            return
+        self.processes[profile_id] = process
+        self.markers[profile_id] = marker
+        threading.Thread(target=self._read_output, args=(profile_id, process), daemon=True).start()
+        log("INFO", f"已启动主播 {profile_id} (PID: {process.pid})")
+
+    def _read_output(self, profile_id, process):
+        for line in iter(process.stdout.readline, ''):
+            line = line.strip()
+            if line.startswith("LOG:"):
+                parts = line.split(":", 2)
+                if len(parts) > 2 and parts[1] != "DEBUG": log(parts[1], f"[{profile_id}] {parts[2]}")
+            elif line.startswith("STATUS:"):
+                log("INFO", f"[{profile_id}] 状态: {line.split(':', 1)[1]}")
+
+    def _reap_exited(self):
+        for profile_id, process in list(self.processes.items()):
+            if process is not None and process.poll() is not None:
+                log("WARN", f"主播 {profile_id} 的程序已退出 (返回码 {process.returncode})，等待下次心跳重新启动。")
+                del self.processes[profile_id]
+                self.kbps.pop(profile_id, None)
+                # 与 _stop_profile 相同，接管来的 FFmpeg 不在进程树中，依检查点一并清理
+                state = checkpoint.load_live(os.path.join(self.profiles_dir, profile_id))
+                leftovers = supervisor.reap_tree(process.pid, self.markers.pop(profile_id, None), extra={state['ffmpeg_pid']} if state else ())
+                if leftovers: log("WARN", f"已清理主播 {profile_id} 遗留的 {leftovers} 个子进程。")
+
+    def _stop_profile(self, *profile_ids: str):
+        # 连同 FFmpeg / 浏览器整棵进程树一起停止，确保被收回的租约不会留下仍在推流的 FFmpeg
+        entries = []
+        for profile_id in profile_ids:
+            process = self.processes.pop(profile_id, None)
+            marker = self.markers.pop(profile_id, None)
+            self.lease_expiry.pop(profile_id, None)
+            self.kbps.pop(profile_id, None)
+            if process is None: continue
+            entry = {'id': profile_id, 'pid': process.pid, 'marker': marker, 'process': process}
+            # 工作进程接管来的 FFmpeg 不在其进程树中，依检查点一并停止
+            state = checkpoint.load_live(os.path.join(self.profiles_dir, profile_id))
+            if state: entry['extra'] = {state['ffmpeg_pid']}
+            entries.append(entry)
+        for profile_id, result in supervisor.shutdown_many(entries, timeout=STOP_TIMEOUT).items():
+            if result == 'killed': log("WARN", f"主播 {profile_id} 未在 {STOP_TIMEOUT} 秒内退出，已强制结束。")
+
+    def shutdown(self):
+        log("INFO", f"节点 {self.node_id} 正在停止所有推流并离线...")
+        self._stop_profile(*self.processes)
+        try:
+            _post(f"{self.coordinator_url}/deregister", {'node_id': self.node_id})
+        except Exception as e:
+            log("WARN", f"离线通知失败: {e}")
+
+
+def run_worker(args):
+    node = WorkerNode(args.coordinator, args.node_id, args.slots, args.bandwidth, args.profiles_dir, dry_run=args.dry_run)
+
+    def _stop(signum, frame): node.is_running = False
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        node.run()
+    except KeyboardInterrupt:
+        node.shutdown()
+
+# ====================================================================
+#                           状态报告
+# ====================================================================
+def print_status(status: dict):
+    log("INFO", f"===== 集群状态 (租约 {status['lease_ttl']} 秒) =====")
+    for node_id, node in sorted(status['nodes'].items()):
+        bw = f"{node['leased_kbps']}/{node['bandwidth_kbps']}" if node['bandwidth_kbps'] else f"{node['leased_kbps']}/不限"
+        state = "在线" if node['alive'] else f"失联 {node['last_seen_ago']}s"
+        log("INFO", f"  {node_id:<12} {state:<10} 槽位 {node['used_slots']}/{node['slots']}  带宽 {bw} kbps  负载 {node['load']:.2f}/{node['cpu_count']}  运行中 {len(node['running'])}")
+    if status['unassigned']:
+        log("WARN", f"  待分配: {', '.join(status['unassigned'])}")
+    failover = status['failover']
+    if failover['count']:
+        log("INFO", f"  故障转移 {failover['count']} 次，平均 {failover['avg_latency']} 秒，最长 {failover['max_latency']} 秒")
+
+
+def run_status(args):
+    with urllib.request.urlopen(f"{args.coordinator.rstrip('/')}/status", timeout=5) as response:
+        status = json.loads(response.read().decode('utf-8'))
+    if args.json: print(json.dumps(status, ensure_ascii=False, indent=2))
+    else: print_status(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抖音转播多节点调度")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('coordinator', help="启动协调器")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--lease-ttl', type=int, default=DEFAULT_LEASE_TTL, help="租约有效期 (秒)，决定故障转移的上限时间")
+    p.add_argument('--group', default=None, help="只调度指定分组的主播")
+    p.add_argument('--max-load', type=float, default=0.9, help="节点每核心平均负载超过此值时不再分配")
+    p.add_argument('--report-interval', type=int, default=30, help="定期输出集群状态的间隔 (秒)，0 为关闭")
+    p.add_argument('--profiles-dir', default=PROFILES_DIR)
+    p.set_defaults(func=run_coordinator)
+
+    p = sub.add_parser('worker', help="启动工作节点")
+    p.add_argument('--coordinator', required=True)
+    p.add_argument('--node-id', required=True)
+    p.add_argument('--slots', type=int, default=4, help="本节点最多同时推流数")
+    p.add_argument('--bandwidth', type=int, default=0, help="本节点上行带宽 (kbps)，0 为不限")
+    p.add_argument('--dry-run', action='store_true', help="只持有租约而不真正启动 streamer.py，用于测试调度与故障转移")
+    p.add_argument('--profiles-dir', default=PROFILES_DIR)
+    p.set_defaults(func=run_worker)
+
+    p = sub.add_parser('status', help="查看集群状态")
+    p.add_argument('--coordinator', required=True)
+    p.add_argument('--json', action='store_true')
+    p.set_defaults(func=run_status)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# detect_cache.py (v1.0 - 跨进程共享检测快取)
+"""
+主机级的抖音开播检测快取。
+
+所有 streamer.py 进程共用同一个 SQLite 档案，以 douyin_id 为键保存最近一次
+抓取的结果 (是否开播、直播流地址、标题)，在 TTL 内直接复用。
+同一个 douyin_id 同时只会有一个进程真正启动浏览器去抓取，其他进程
+会等待它的结果 (请求合併)，避免重复开浏览器。
+
+同一档案中的 BandwidthLedger 记录本机各主播正在推流的码率，
+用于在节点带宽预算内为新开播的主播挑选画质。
+
+用法：
+  python detect_cache.py stats   # 查看命中率与被合併的抓取次数
+  python detect_cache.py clear   # 清空快取与统计
+"""
+import json
+import os
+import sqlite3
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB_PATH = os.path.join(script_dir, 'detect_cache.db')
+
+STAT_NAMES = ("hits", "scrapes", "coalesced")
+
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform == 'win32': return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class DetectionCache:
+    def __init__(self, db_path: str = CACHE_DB_PATH, ttl: float = 15, inflight_timeout: float = 180, poll_interval: float = 0.5):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.inflight_timeout = inflight_timeout
+        self.poll_interval = poll_interval
+        self.owner = str(os.getpid())
+        # autocommit 模式：每条语句各自提交，需要原子性时显式 BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (douyin_id TEXT PRIMARY KEY, payload TEXT NOT NULL, fetched_at REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS inflight (douyin_id TEXT PRIMARY KEY, owner TEXT NOT NULL, started_at REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def get_or_fetch(self, douyin_id: str, fetch) -> tuple[dict, str]:
+        """
+        返回 (payload, source)。source 为 'hit' (命中快取)、'coalesced' (等待了其他进程的抓取)
+        或 'scrape' (由本进程实际抓取)。fetch() 需返回可 JSON 序列化的 dict；
+        返回 None 表示抓取失败，失败的结果不写入快取，等待中的进程会自行重新抓取。
+        """
+        if self.ttl <= 0:
+            return fetch(), 'scrape'
+        requested_at = time.time()
+        while True:
+            payload = self._fresh_entry(douyin_id, requested_at - self.ttl)
+            if payload is not None:
+                self._bump('hits')
+                return payload, 'hit'
+            if self._claim(douyin_id):
+                try:
+                    payload = fetch()
+                    if payload is not None: self._store(douyin_id, payload)
+                    self._bump('scrapes')
+                    return payload, 'scrape'
+                finally:
+                    self._release(douyin_id)
+            payload = self._wait_for_owner(douyin_id, requested_at)
+            if payload is not None:
+                self._bump('coalesced')
+                return payload, 'coalesced'
+            # 抓取者失败或已消失，重新尝试认领
+
+    def _fresh_entry(self, douyin_id: str, min_fetched_at: float):
+        row = self.conn.execute("SELECT payload FROM entries WHERE douyin_id = ? AND fetched_at >= ?", (douyin_id, min_fetched_at)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _claim(self, douyin_id: str) -> bool:
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT owner, started_at FROM inflight WHERE douyin_id = ?", (douyin_id,)).fetchone()
+            if row and (now - row[1] > self.inflight_timeout or not _pid_alive(int(row[0]))):
+                self.conn.execute("DELETE FROM inflight WHERE douyin_id = ?", (douyin_id,))
+                row = None
+            if row is None:
+                self.conn.execute("INSERT INTO inflight (douyin_id, owner, started_at) VALUES (?, ?, ?)", (douyin_id, self.owner, now))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return row is None
+
+    def _release(self, douyin_id: str):
+        self.conn.execute("DELETE FROM inflight WHERE douyin_id = ? AND owner = ?", (douyin_id, self.owner))
+
+    def _wait_for_owner(self, douyin_id: str, requested_at: float):
+        deadline = time.time() + self.inflight_timeout
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            payload = self._fresh_entry(douyin_id, requested_at - self.ttl)
+            if payload is not None: return payload
+            row = self.conn.execute("SELECT owner FROM inflight WHERE douyin_id = ?", (douyin_id,)).fetchone()
+            if row is None or not _pid_alive(int(row[0])): return None
+        return None
+
+    def _store(self, douyin_id: str, payload: dict):
+        self.conn.execute("INSERT OR REPLACE INTO entries (douyin_id, payload, fetched_at) VALUES (?, ?, ?)", (douyin_id, json.dumps(payload, ensure_ascii=False), time.time()))
+
+    def _bump(self, name: str):
+        self.conn.execute("INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def stats(self) -> dict:
+        values = dict(self.conn.execute("SELECT name, value FROM stats").fetchall())
+        entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        result = {name: values.get(name, 0) for name in STAT_NAMES}
+        total = sum(result.values())
+        result['requests'] = total
+        result['hit_rate'] = round((result['hits'] + result['coalesced']) / total, 3) if total else None
+        result['entries'] = entries
+        return result
+
+    def clear(self):
+        for table in ("entries", "inflight", "stats"):
+            self.conn.execute(f"DELETE FROM {table}")
+
+
+class BandwidthLedger:
+    """本机推流码率帐本：各进程登记自己占用的 kbps，已退出进程的登记自动失效。"""
+    def __init__(self, db_path: str = CACHE_DB_PATH):
+        self.owner = str(os.getpid())
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS bandwidth (douyin_id TEXT PRIMARY KEY, kbps INTEGER NOT NULL, owner TEXT NOT NULL, updated_at REAL NOT NULL)")
+
+    def _used_by_others(self, douyin_id: str) -> int:
+        rows = self.conn.execute("SELECT douyin_id, kbps, owner FROM bandwidth WHERE douyin_id != ?", (douyin_id,)).fetchall()
+        used = 0
+        for other_id, kbps, owner in rows:
+            if _pid_alive(int(owner)): used += kbps
+            else: self.conn.execute("DELETE FROM bandwidth WHERE douyin_id = ?", (other_id,))
+        return used
+
+    def reserve_within(self, douyin_id: str, budget_kbps: int, pick):
+        """
+        在一个事务内计算剩余预算并登记占用。pick(remaining_kbps) 需返回 (结果, 占用kbps)；
+        budget_kbps 为 0 时 remaining 亦为 0 (表示不限)。结果为 None 时不登记。
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            remaining = max(1, budget_kbps - self._used_by_others(douyin_id)) if budget_kbps else 0
+            result, kbps = pick(remaining)
+            if result is not None:
+                self.conn.execute("INSERT OR REPLACE INTO bandwidth (douyin_id, kbps, owner, updated_at) VALUES (?, ?, ?, ?)", (douyin_id, kbps, self.owner, time.time()))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def release(self, douyin_id: str):
+        self.conn.execute("DELETE FROM bandwidth WHERE douyin_id = ? AND owner = ?", (douyin_id, self.owner))
+
+    def total(self) -> int:
+        return self._used_by_others("")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = DetectionCache()
+    if command == "clear":
+        cache.clear()
+        print("已清空检测快取与统计。")
+    else:
+        s = cache.stats()
+        rate = f"{s['hit_rate'] * 100:.1f}%" if s['hit_rate'] is not None else "--"
+        print(f"请求 {s['requests']} 次 | 命中快取 {s['hits']} | 合併等待 {s['coalesced']} | 实际抓取 {s['scrapes']} | 复用率 {rate} | 快取条目 {s['entries']}")
+        print(f"本机推流占用码率: {BandwidthLedger().total()} kbps")
@@ -2,70 +2,320 @@
 import time
 import re
 import html
-from playwright.sync_api import sync_playwright
+import json
+from dataclasses import dataclass, field, asdict
 
-def get_stream_info(douyin_id: str, chrome_path: str, proxy_config: dict, wait_time: int) -> tuple[str | None, str | None]:
+# 画质由高到低排列；FLV 拉流地址的键名 / SDK 画质键名统一映射到这些名称
+QUALITY_ORDER = ["origin", "FULL_HD", "HD", "SD", "LD"]
+FLV_KEY_MAP = {"ORIGION": "origin", "ORIGIN": "origin", "FULL_HD1": "FULL_HD", "HD1": "HD", "SD1": "SD", "SD2": "LD"}
+SDK_KEY_MAP = {"origin": "origin", "uhd": "FULL_HD", "hd": "HD", "sd": "SD", "ld": "LD", "md": "LD"}
+
+ROOM_STATUS_LIVE = 2
+
+# 在页面内直接取出内嵌的直播间 JSON，避免把数 MB 的 HTML 传回 Python 再做全文正则
+_ROOM_SCRIPT_JS = """() => {
+    const render = document.getElementById('RENDER_DATA');
+    if (render && render.textContent) return [decodeURIComponent(render.textContent)];
+    return (self.__pace_f || []).map(x => x && x[1]).filter(x => typeof x === 'string' && x.includes('"roomStore"'));
+}"""
+_ROOM_STORE_RE = re.compile(r'"roomStore"\s*:\s*')
+_LEGACY_FLV_RE = re.compile(r'(https://[^\s"]+\.flv[^\s"]+)')
+
+
+@dataclass
+class StreamQuality:
+    name: str
+    flv_url: str | None = None
+    hls_url: str | None = None
+    bitrate_kbps: int = 0
+    resolution: str = ""
+
+    @property
+    def url(self) -> str | None:
+        """推流使用的拉流地址：优先 FLV，没有时用 HLS (FFmpeg 两者都能读取)。"""
+        return self.flv_url or self.hls_url
+
+
+@dataclass
+class RoomInfo:
+    status: int = 0
+    title: str = ""
+    qualities: list[StreamQuality] = field(default_factory=list)
+
+    @property
+    def is_live(self) -> bool:
+        return self.status == ROOM_STATUS_LIVE and any(q.url for q in self.qualities)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RoomInfo":
+        qualities = [StreamQuality(**q) for q in data.get("qualities", [])]
+        return cls(status=int(data.get("status", 0)), title=data.get("title") or "", qualities=qualities)
+
+
+def _quality_rank(name: str) -> int:
+    return QUALITY_ORDER.index(name) if name in QUALITY_ORDER else len(QUALITY_ORDER)
+
+
+def normalize_quality(name: str) -> str:
+    """不区分大小写地对应到 QUALITY_ORDER 中的名称 (hd -> HD)，无法对应时原样返回。"""
+    name = (name or "").strip()
+    return next((q for q in QUALITY_ORDER if q.lower() == name.lower()), name)
+
+
+def parse_bitrate_kbps(value) -> int:
+    """把 '4000k' / '4M' / '4000' 这类码率设定转换为 kbps。"""
+    text = str(value or '').strip().lower()
+    if not text: return 0
+    try:
+        if text.endswith('k'): return int(float(text[:-1]))
+        if text.endswith('m'): return int(float(text[:-1]) * 1000)
+        number = int(float(text))
+        return number // 1000 if number >= 100000 else number
+    except ValueError:
+        return 0
+
+
+def _loads_maybe(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return {}
+    return value or {}
+
+
+def parse_room_store(chunks: list[str]) -> RoomInfo | None:
+    """从页面内嵌脚本中解析 roomStore，返回包含所有画质的 RoomInfo；找不到时返回 None。"""
+    decoder = json.JSONDecoder()
+    for chunk in chunks:
+        match = _ROOM_STORE_RE.search(chunk)
+        if not match: continue
+        try:
+            store, _ = decoder.raw_decode(chunk, match.end())
+        except ValueError:
+            continue
+        room = (store.get("roomInfo") or {}).get("room") or {}
+        if room: return _parse_room(room)
+    return None
+
+
+def _parse_room(room: dict) -> RoomInfo:
+    qualities: dict[str, StreamQuality] = {}
+
+    def entry(name: str) -> StreamQuality:
+        return qualities.setdefault(name, StreamQuality(name=name))
+
+    stream_url = room.get("stream_url") or {}
+    for key, url in (stream_url.get("flv_pull_url") or {}).items():
+        entry(FLV_KEY_MAP.get(key, key)).flv_url = url
+    for key, url in (stream_url.get("hls_pull_url_map") or {}).items():
+        entry(FLV_KEY_MAP.get(key, key)).hls_url = url
+
+    # live_core_sdk_data 内含原画 (origin) 以及各画质的码率/分辨率
+    pull_data = (stream_url.get("live_core_sdk_data") or {}).get("pull_data") or {}
+    for sdk_key, info in (_loads_maybe(pull_data.get("stream_data")).get("data") or {}).items():
+        main = (info or {}).get("main") or {}
+        quality = entry(SDK_KEY_MAP.get(sdk_key, sdk_key))
+        quality.flv_url = quality.flv_url or main.get("flv")
+        quality.hls_url = quality.hls_url or main.get("hls")
+        params = _loads_maybe(main.get("sdk_params"))
+        if params.get("vbitrate"): quality.bitrate_kbps = int(params["vbitrate"]) // 1000
+        if params.get("resolution"): quality.resolution = params["resolution"]
+    for option in (pull_data.get("options") or {}).get("qualities") or []:
+        quality = qualities.get(SDK_KEY_MAP.get(option.get("sdk_key"), option.get("sdk_key")))
+        if quality and not quality.bitrate_kbps and option.get("v_bit_rate"):
+            quality.bitrate_kbps = int(option["v_bit_rate"]) // 1000
+
+    ordered = sorted((q for q in qualities.values() if q.url), key=lambda q: _quality_rank(q.name))
+    return RoomInfo(status=int(room.get("status") or 0), title=room.get("title") or "", qualities=ordered)
+
+
+def select_quality(room: RoomInfo, preferred: str = "origin", max_bitrate_kbps: int = 0, fallback_kbps: int = 0) -> StreamQuality | None:
+    """
+    按策略选择画质：从 preferred 开始往低画质找，没有符合的再往高画质找最接近的，
+    返回第一个有拉流地址 (FLV 或 HLS)、且码率不超过 max_bitrate_kbps (0 为不限) 的画质。
+    码率未知的画质以 fallback_kbps 估计 (为 0 时视为符合)。
+    """
+    preferred = normalize_quality(preferred)
+    available = sorted((q for q in room.qualities if q.url), key=lambda q: _quality_rank(q.name))
+    if preferred in QUALITY_ORDER:
+        rank = _quality_rank(preferred)
+        candidates = [q for q in available if _quality_rank(q.name) >= rank] + [q for q in reversed(available) if _quality_rank(q.name) < rank]
+    else:
+        candidates = available
+    for quality in candidates:
+        estimated_kbps = quality.bitrate_kbps or fallback_kbps
+        if not max_bitrate_kbps or not estimated_kbps or estimated_kbps <= max_bitrate_kbps:
+            return quality
+    return None
+
+
+@dataclass
+class ScrapeResult:
+    room: RoomInfo | None = None
+    outcome: str = "ok"          # ok / blocked (验证码、403/429) / error
+    goto_seconds: float = 0.0    # 页面导航耗时
+    total_seconds: float = 0.0   # 整次抓取耗时 (含 wait_time)
+    error: str = ""
+
+
+class BrowserPool:
     """
-    使用 Playwright 访问抖音直播间，获取 FLV 直播流地址和直播标题。
+    按代理复用浏览器：每个代理一个浏览器与上下文 (保留 Cookie 与连线)。
+    release_idle() 会关闭超过 keepalive 秒未使用的浏览器；keepalive 为 0 时每次抓取后都关闭。
+    推流期间不再抓取，需由等待循环定期调用 release_idle()，浏览器才会按时关闭。
+    Playwright 同步 API 只能在建立它的执行绪中使用。
+    """
+    def __init__(self, keepalive: float = 0):
+        self.keepalive = keepalive
+        self._playwright = None
+        self._contexts = {}  # 代理伺服器 -> [browser, context, 最后使用时间]
+
+    def context(self, chrome_path: str, proxy_config: dict):
+        key = (proxy_config or {}).get("server") or ""
+        entry = self._contexts.get(key)
+        # 已断线或闲置超过 keepalive 的浏览器不再复用，重新启动
+        if entry and (not entry[0].is_connected() or time.time() - entry[2] > self.keepalive):
+            self._close(key); entry = None
+        if entry is None:
+            if self._playwright is None:
+                # 延迟导入：只解析页面资料 (测试、cluster) 时不需要安装 Playwright
+                from playwright.sync_api import sync_playwright
+                self._playwright = sync_playwright().start()
+            launch_options = {
+                "headless": True,
+                "executable_path": chrome_path
+            }
+            # 如果提供了代理伺服器地址，则加入代理设定
+            if key: launch_options["proxy"] = proxy_config
+            browser = self._playwright.chromium.launch(**launch_options)
+            entry = self._contexts[key] = [browser, browser.new_context(), 0.0]
+        entry[2] = time.time()
+        return entry[1]
+
+    def touch(self, proxy_config: dict):
+        """抓取结束时更新最后使用时间，闲置时间从抓取结束起算。"""
+        entry = self._contexts.get((proxy_config or {}).get("server") or "")
+        if entry: entry[2] = time.time()
+
+    def release_idle(self):
+        now = time.time()
+        for key in [key for key, entry in self._contexts.items() if now - entry[2] >= self.keepalive]: self._close(key)
+        if not self._contexts and self._playwright:
+            self._playwright.stop(); self._playwright = None
+
+    def _close(self, key: str):
+        try:
+            self._contexts.pop(key)[0].close()
+        except Exception:
+            pass
+
+    def close(self):
+        for key in list(self._contexts): self._close(key)
+        self.release_idle()
+
+
+def _print_log(level: str, message: str):
+    print(f"LOG:{level}:{message}")
+
+
+def scrape_room(douyin_id: str, chrome_path: str, proxy_config: dict, wait_time: int, browsers: BrowserPool | None = None, goto_timeout: float = 60, log=None) -> ScrapeResult:
+    """
+    使用 Playwright 访问抖音直播间，解析内嵌的直播间 JSON，返回开播状态、标题与所有可用画质，
+    以及本次抓取的结果类别与耗时 (供代理池评分)。
 
     Args:
         douyin_id (str): 抖音主播的房间ID。
         chrome_path (str): 浏览器可执行档路径。
         proxy_config (dict): 代理设定字典，包含 'server' 和 'username', 'password' (可选)。
         wait_time (int): 页面加载后的等待时间（秒）。
-
-    Returns:
-        tuple[str | None, str | None]: (flv_url, title) 或 (None, None)
+        browsers (BrowserPool): 复用的浏览器；不提供时本次抓取结束即关闭浏览器。
+        goto_timeout (float): 页面导航的超时时间（秒）。
+        log (callable): 日志函数 log(level, message)，由呼叫者按日志等级过滤；预设直接输出 LOG: 行。
     """
+    log = log or _print_log
     url = f"https://live.douyin.com/{douyin_id}"
-    
+    own_browsers = browsers is None
+    browsers = browsers or BrowserPool()
+    result = ScrapeResult()
+    started = time.time()
+    page = None
+
     try:
-        with sync_playwright() as p:
-            launch_options = {
-                "headless": True,
-                "executable_path": chrome_path
-            }
-            # 如果提供了代理伺服器地址，则加入代理设定
-            if proxy_config and proxy_config.get("server"):
-                launch_options["proxy"] = proxy_config
-                print(f"LOG:INFO:抓流模组将使用代理: {proxy_config.get('server')}")
-
-            browser = p.chromium.launch(**launch_options)
-            page = browser.new_page()
-
-            print(f"LOG:INFO:正在导航至抖音直播页: {url}")
-            page.goto(url, timeout=60000)
-            
-            print(f"LOG:INFO:页面初步加载完成，等待 {wait_time} 秒以确保动态内容渲染...")
-            time.sleep(wait_time)
-            
-            html_content = page.content()
-            
-            # 从 HTML 中正则匹配 FLV 流地址
-            flv_match = re.search(r'(https://[^\s"]+\.flv[^\s"]+)', html_content)
-            flv_url = None
+        if proxy_config and proxy_config.get("server"):
+            log("INFO", f"抓流模组将使用代理: {proxy_config.get('server')}")
+        page = browsers.context(chrome_path, proxy_config).new_page()
+
+        log("INFO", f"正在导航至抖音直播页: {url}")
+        response = page.goto(url, timeout=goto_timeout * 1000)
+        result.goto_seconds = time.time() - started
+
+        page_title_full = page.title()
+        if (response is not None and response.status in (403, 429)) or "验证码" in page_title_full:
+            result.outcome = "blocked"
+            result.error = f"HTTP {response.status}" if response is not None and response.status in (403, 429) else "验证码页面"
+            log("WARN", f"抖音页面被拦截 ({result.error})，本次抓取作废。")
+            return result
+
+        log("INFO", f"页面初步加载完成，等待 {wait_time} 秒以确保动态内容渲染...")
+        time.sleep(wait_time)
+
+        room = parse_room_store(page.evaluate(_ROOM_SCRIPT_JS))
+        if room is None:
+            # 页面结构变化时退回旧方法：在 HTML 中正则匹配第一个 FLV 流地址
+            log("WARN", "未找到内嵌的直播间数据，改用旧的 HTML 匹配方式。")
+            flv_match = _LEGACY_FLV_RE.search(page.content())
+            room = RoomInfo()
             if flv_match:
                 # 进行 HTML 反转义，并去除可能的引号污染
-                flv_url = html.unescape(flv_match.group(1).split('"')[0])
+                room.status = ROOM_STATUS_LIVE
+                room.qualities.append(StreamQuality(name="unknown", flv_url=html.unescape(flv_match.group(1).split('"')[0])))
 
+        if not room.title:
             # 获取页面标题
             page_title_full = page.title()
-            title = page_title_full.split(" - 抖音")[0] if " - 抖音" in page_title_full else page_title_full
-            
-            browser.close()
-            
-            if flv_url:
-                print(f"LOG:INFO:成功获取到直播流地址。")
-            else:
-                print("LOG:WARN:未能在页面中找到 FLV 直播流地址。")
-                
-            if title:
-                print(f"LOG:INFO:成功获取到直播标题: {title}")
-            else:
-                 print("LOG:WARN:未能获取到有效的直播标题。")
-
-            return flv_url, title
-            
+            room.title = page_title_full.split(" - 抖音")[0] if " - 抖音" in page_title_full else page_title_full
+
+        if room.is_live:
+            summary = ", ".join(f"{q.name}{f'({q.bitrate_kbps}kbps)' if q.bitrate_kbps else ''}" for q in room.qualities)
+            log("INFO", f"成功获取到直播流地址，可用画质: {summary}")
+        else:
+            log("WARN", "未能在页面中找到直播流地址。")
+
+        if room.title:
+            log("INFO", f"成功获取到直播标题: {room.title}")
+        else:
+             log("WARN", "未能获取到有效的直播标题。")
+
+        result.room = room
+        return result
+
     except Exception as e:
-        print(f"LOG:ERROR:抖音抓流过程中发生严重错误: {e}")
-        return None, None
+        log("ERROR", f"抖音抓流过程中发生严重错误: {e}")
+        result.outcome, result.error = "error", str(e)
+        return result
+    finally:
+        result.total_seconds = time.time() - started
+        if page is not None:
+            try:
+                page.close()
+            except Exception:
+                pass
+        if own_browsers: browsers.close()
+        else: browsers.touch(proxy_config)
+
+
+def get_room_info(douyin_id: str, chrome_path: str, proxy_config: dict, wait_time: int) -> RoomInfo | None:
+    """兼容旧接口：只返回 RoomInfo，抓取过程出错时返回 None。"""
+    return scrape_room(douyin_id, chrome_path, proxy_config, wait_time).room
+
+
+def get_stream_info(douyin_id: str, chrome_path: str, proxy_config: dict, wait_time: int) -> tuple[str | None, str | None]:
+    """兼容旧接口：返回最高画质的 (拉流地址, title)，失败时返回 (None, None)。"""
+    room = get_room_info(douyin_id, chrome_path, proxy_config, wait_time)
+    if room is None or not room.is_live: return None, (room.title if room else None)
+    quality = select_quality(room)
+    return (quality.url if quality else None), room.title
@@ -0,0 +1,275 @@
+# loadtest.py (v1.0 - 主控台压力测试)
+"""
+主控台 (manager.py) 的合成负载测试。
+
+启动 N 个假的工作进程，它们按照与 streamer.py 相同的协议 (LOG:/STATUS:/TITLE:)
+输出状态切换、标题变化以及类似 FFmpeg 的大量日志，用来量测 ManagerApp 在多少个
+主播同时运行时仍然流畅：
+
+  - UI 事件延迟：假工作进程送出日志到它出现在日志区的时间，以及 read_output
+    执行绪经由 self.after(0, ...) 排入的回调真正被执行前的等待时间
+  - 主循环卡顿：每 20 毫秒的心跳实际被延后了多久
+  - 积压与遗失：log_queue 的积压量、送出但直到结束都没显示的日志条数
+  - 主控台的记忆体用量随时间的变化
+
+用法：
+  python loadtest.py run --workers 50 --duration 60 --log-rate 20 --burst-every 10 --burst-size 300
+  python loadtest.py run --workers 100 --duration 120 --report report.json --max-p95-ms 500 --max-stall-ms 1000
+
+设定了 --max-* 门槛时，超过任一门槛会以返回码 1 结束，可用于防止效能倒退。
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+LATENCY_MARKER = "LT@"
+SENT_MARKER = "LT-SENT "
+STATUSES = ["checking", "offline", "checking", "streaming"]
+
+# ====================================================================
+#                           假工作进程
+# ====================================================================
+def run_fake_worker(args):
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    rng = random.Random(os.getpid())
+    sent = 0
+
+    def emit(line):
+        sys.stdout.write(line + "\n")
+
+    def stamp():
+        nonlocal sent
+        sent += 1
+        return f"{LATENCY_MARKER}{time.time():.6f}#{sent}"
+
+    now = time.time()
+    due = {
+        "status": now + rng.uniform(0, 1 / args.status_rate) if args.status_rate else None,
+        "title": now + rng.uniform(0, 1 / args.title_rate) if args.title_rate else None,
+        "log": now + rng.uniform(0, 1 / args.log_rate) if args.log_rate else None,
+        "burst": now + rng.uniform(0, args.burst_every) if args.burst_every else None,
+    }
+    emit("LOG:INFO:假工作进程已启动。"); emit("STATUS:starting"); sys.stdout.flush()
+    end = now + args.duration
+    status_index = 0
+    while not stopping.is_set() and time.time() < end:
+        now = time.time()
+        if due["status"] and now >= due["status"]:
+            status_index = (status_index + 1) % len(STATUSES)
+            emit(f"STATUS:{STATUSES[status_index]}")
+            due["status"] = now + rng.expovariate(args.status_rate)
+        if due["title"] and now >= due["title"]:
+            emit(f"TITLE:压力测试标题 {rng.randint(1, 10 ** 6)}")
+            due["title"] = now + rng.expovariate(args.title_rate)
+        if due["log"] and now >= due["log"]:
+            emit(f"LOG:INFO:正在检查主播状态... {stamp()}")
+            due["log"] = now + rng.expovariate(args.log_rate)
+        if due["burst"] and now >= due["burst"]:
+            # 模拟 FFmpeg 启动时一次性输出的大量日志
+            for i in range(args.burst_size):
+                emit(f"LOG:DEBUG:[FFmpeg] frame={i:6d} fps=30 q=-1.0 size={i * 64:8d}kB time=00:00:{i % 60:02d}.00 bitrate=4000.0kbits/s speed=1x {stamp()}")
+            due["burst"] = now + args.burst_every
+        sys.stdout.flush()
+        pending = [t for t in due.values() if t]
+        stopping.wait(max(0.001, min(pending) - time.time()) if pending else 0.5)
+    emit(f"LOG:INFO:{SENT_MARKER}{sent}"); emit("STATUS:stopped"); sys.stdout.flush()
+
+# ====================================================================
+#                           量测用主控台
+# ====================================================================
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values: return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {"count": len(ordered), "p50": round(pick(0.50), 1), "p95": round(pick(0.95), 1), "p99": round(pick(0.99), 1), "max": round(ordered[-1], 1)}
+
+
+def run_load_test(args):
+    import manager
+    import supervisor
+
+    workdir = tempfile.mkdtemp(prefix="manager-loadtest-")
+    profiles_dir = os.path.join(workdir, "profiles")
+    os.makedirs(profiles_dir)
+    for i in range(args.workers):
+        profile_id = f"loadtest{i:04d}"
+        os.makedirs(os.path.join(profiles_dir, profile_id))
+        with open(os.path.join(profiles_dir, profile_id, "config.ini"), "w", encoding="utf-8") as f:
+            f.write(f"[Douyin]\ndouyin_id = {profile_id}\n[Custom]\nremarks = 压力测试\ngroup = 默认分组\n")
+    with open(os.path.join(workdir, "groups.json"), "w", encoding="utf-8") as f:
+        json.dump(["默认分组"], f, ensure_ascii=False)
+    # 不回收残留进程、不探测代理：真实主控台崩溃后留下的工作进程与推流要留给它下次启动时接管
+    with open(os.path.join(workdir, "manager.ini"), "w", encoding="utf-8") as f:
+        f.write("[Supervisor]\nreap_orphans_on_start = false\n[ProxyPool]\nprobe_interval = 0\n")
+    # 所有档案都放在临时目录，不碰真实的 profiles/、logs/、run/ 与代理池
+    manager.PROFILES_DIR = profiles_dir
+    manager.CREDENTIALS_DIR = os.path.join(workdir, "credentials")
+    manager.GROUPS_FILE = os.path.join(workdir, "groups.json")
+    manager.MANAGER_CONFIG_PATH = os.path.join(workdir, "manager.ini")
+    manager.LOGS_DIR = os.path.join(workdir, "logs")
+    manager.PROXIES_FILE = os.path.join(workdir, "proxies.json")
+    manager.PROXY_POOL_DB_PATH = os.path.join(workdir, "proxy_pool.db")
+    supervisor.RUN_DIR = os.path.join(workdir, "run")
+
+    worker_args = ["--duration", str(args.duration), "--status-rate", str(args.status_rate), "--title-rate", str(args.title_rate),
+                   "--log-rate", str(args.log_rate), "--burst-every", str(args.burst_every), "--burst-size", str(args.burst_size)]
+
+    class LoadTestManager(manager.ManagerApp):
+        def __init__(self):
+            self.metrics = {"log_latency_ms": [], "callback_latency_ms": [], "stalls_ms": [], "queue_depth": [], "rss_mb": [], "sent": 0, "received": 0}
+            self.main_thread = threading.current_thread()
+            super().__init__()
+
+        def worker_command(self, profile_path, initial_delay=0):
+            return [sys.executable, "-u", os.path.abspath(__file__), "worker", profile_path] + worker_args
+
+        def after(self, ms, func=None, *args):
+            # 记录由 read_output 执行绪排入的回调在主循环中等待了多久
+            if ms == 0 and func is not None and threading.current_thread() is not self.main_thread:
+                queued_at = time.perf_counter()
+                def timed(*a):
+                    self.metrics["callback_latency_ms"].append((time.perf_counter() - queued_at) * 1000)
+                    func(*a)
+                return super().after(ms, timed, *args)
+            return super().after(ms, func, *args)
+
+        def _append_logs(self, batch):
+            super()._append_logs(batch)
+            now = time.time()
+            for messages, _ in batch:
+                for message in messages:
+                    marker = message.rfind(LATENCY_MARKER)
+                    if marker >= 0:
+                        self.metrics["received"] += 1
+                        self.metrics["log_latency_ms"].append((now - float(message[marker + len(LATENCY_MARKER):].split("#")[0])) * 1000)
+                    elif SENT_MARKER in message:
+                        self.metrics["sent"] += int(message.rsplit(SENT_MARKER, 1)[1])
+
+    app = LoadTestManager()
+    started = time.time()
+    heartbeat = {"last": time.perf_counter()}
+
+    def tick():
+        now = time.perf_counter()
+        app.metrics["stalls_ms"].append(max(0.0, (now - heartbeat["last"]) * 1000 - 20))
+        heartbeat["last"] = now
+        app.after(20, tick)
+
+    def sample():
+        app.metrics["queue_depth"].append(app.log_queue.qsize())
+        app.metrics["rss_mb"].append(round(_rss_mb(), 1))
+        app.after(1000, sample)
+
+    def start_workers():
+        for profile_id, card in list(app.streamer_cards.items()):
+            app.start_streamer(card.profile_path, profile_id)
+
+    def finish():
+        for profile_id in list(app.running_processes): app.stop_streamer(profile_id)
+        app.after(int(args.drain * 1000), app.quit)
+
+    app.after(20, tick)
+    app.after(0, sample)
+    app.after(500, start_workers)
+    app.after(int((args.duration + 2) * 1000), finish)
+    app.mainloop()
+    elapsed = time.time() - started
+
+    m = app.metrics
+    stalls = m["stalls_ms"]
+    report = {
+        "workers": args.workers, "duration": round(elapsed, 1),
+        "worker_rates": {"status": args.status_rate, "title": args.title_rate, "log": args.log_rate, "burst_every": args.burst_every, "burst_size": args.burst_size},
+        "log_latency_ms": _percentiles(m["log_latency_ms"]),
+        "callback_latency_ms": _percentiles(m["callback_latency_ms"]),
+        "main_loop": {"stall_p99_ms": _percentiles(stalls).get("p99"), "stall_max_ms": round(max(stalls), 1) if stalls else 0, "stalled_seconds": round(sum(s for s in stalls if s > 50) / 1000, 2)},
+        "messages": {"sent": m["sent"], "displayed": m["received"], "missing": max(0, m["sent"] - m["received"]), "max_queue_depth": max(m["queue_depth"] or [0]), "log_writer_dropped": app.log_writer.dropped},
+        "memory_mb": {"start": m["rss_mb"][0] if m["rss_mb"] else None, "peak": max(m["rss_mb"] or [0]), "end": m["rss_mb"][-1] if m["rss_mb"] else None, "timeline": m["rss_mb"]},
+    }
+    try:
+        app.destroy()
+    except Exception:
+        pass
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已写入 {args.report}")
+
+    failures = []
+    p95 = report["log_latency_ms"].get("p95")
+    if args.max_p95_ms and p95 is not None and p95 > args.max_p95_ms: failures.append(f"日志延迟 p95 {p95} ms > {args.max_p95_ms} ms")
+    if args.max_stall_ms and report["main_loop"]["stall_max_ms"] > args.max_stall_ms: failures.append(f"主循环最长卡顿 {report['main_loop']['stall_max_ms']} ms > {args.max_stall_ms} ms")
+    if args.max_missing is not None and report["messages"]["missing"] > args.max_missing: failures.append(f"遗失日志 {report['messages']['missing']} 条 > {args.max_missing} 条")
+    for failure in failures: print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+def print_report(report: dict):
+    log_lat, cb_lat, loop, msgs, mem = report["log_latency_ms"], report["callback_latency_ms"], report["main_loop"], report["messages"], report["memory_mb"]
+    print(f"===== 压力测试结果：{report['workers']} 个假工作进程，{report['duration']} 秒 =====")
+    print(f"日志延迟 (ms)     : p50 {log_lat.get('p50')}  p95 {log_lat.get('p95')}  p99 {log_lat.get('p99')}  max {log_lat.get('max')}  ({log_lat['count']} 条)")
+    print(f"回调等待 (ms)     : p50 {cb_lat.get('p50')}  p95 {cb_lat.get('p95')}  p99 {cb_lat.get('p99')}  max {cb_lat.get('max')}  ({cb_lat['count']} 次)")
+    print(f"主循环卡顿        : p99 {loop['stall_p99_ms']} ms  最长 {loop['stall_max_ms']} ms  累计卡顿 {loop['stalled_seconds']} 秒")
+    print(f"日志条数          : 送出 {msgs['sent']}  显示 {msgs['displayed']}  遗失 {msgs['missing']}  最大积压 {msgs['max_queue_depth']}  写档丢弃 {msgs['log_writer_dropped']}")
+    print(f"记忆体 (MB)       : 开始 {mem['start']}  峰值 {mem['peak']}  结束 {mem['end']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="主控台合成负载测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_rate_args(p):
+        p.add_argument("--duration", type=float, default=60, help="假工作进程持续输出的时间 (秒)")
+        p.add_argument("--status-rate", type=float, default=0.2, help="每个进程每秒的状态切换次数")
+        p.add_argument("--title-rate", type=float, default=0.01, help="每个进程每秒的标题变化次数")
+        p.add_argument("--log-rate", type=float, default=5, help="每个进程每秒的普通日志条数")
+        p.add_argument("--burst-every", type=float, default=30, help="每隔多少秒输出一次 FFmpeg 式的日志爆发，0 为关闭")
+        p.add_argument("--burst-size", type=int, default=200, help="每次爆发的日志行数")
+
+    p = sub.add_parser("run", help="启动主控台并施加负载")
+    p.add_argument("--workers", type=int, default=20)
+    add_rate_args(p)
+    p.add_argument("--drain", type=float, default=3, help="停止工作进程后等待日志消化的时间 (秒)")
+    p.add_argument("--report", default=None, help="把完整结果写入 JSON 档案")
+    p.add_argument("--max-p95-ms", type=float, default=None)
+    p.add_argument("--max-stall-ms", type=float, default=None)
+    p.add_argument("--max-missing", type=int, default=None)
+
+    p = sub.add_parser("worker", help="(内部使用) 假工作进程")
+    p.add_argument("profile_path", nargs="?")
+    add_rate_args(p)
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        run_fake_worker(args)
+    else:
+        sys.exit(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# logstore.py (v1.0 - 持久化日志)
+"""
+每个主播一份的持久化日志：logs/<douyin_id>/current.log，超过大小上限时
+压缩为 logs/<douyin_id>/<时间>.log.gz 并只保留最近若干份。
+
+写入由背景执行绪批次完成，write() 只把日志放进佇列，不会阻塞
+manager 的 read_output 执行绪；佇列满时直接丢弃并计数。
+
+用法：
+  python logstore.py tail <douyin_id> [-n 100] [-f]
+"""
+import argparse
+import gzip
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+LOGS_DIR = os.path.join(script_dir, 'logs')
+CURRENT_LOG_NAME = 'current.log'
+
+
+class LogWriter:
+    def __init__(self, logs_dir: str = LOGS_DIR, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, flush_interval: float = 1.0, queue_size: int = 100000):
+        self.logs_dir = logs_dir
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._files = {}
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, profile_id: str, line: str):
+        try:
+            self.queue.put_nowait((profile_id, f"{time.strftime('%Y-%m-%d %H:%M:%S')} {line}\n"))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5):
+        self._closed.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = {}
+            try:
+                profile_id, text = self.queue.get(timeout=self.flush_interval)
+                batch.setdefault(profile_id, []).append(text)
+                for _ in range(5000):
+                    profile_id, text = self.queue.get_nowait()
+                    batch.setdefault(profile_id, []).append(text)
+            except queue.Empty:
+                pass
+            for profile_id, lines in batch.items():
+                try:
+                    self._append(profile_id, "".join(lines))
+                    self.written += len(lines)
+                except OSError as e:
+                    print(f"LogWriter: 写入 {profile_id} 的日志失败: {e}", file=sys.stderr)
+            if self._closed.is_set() and self.queue.empty():
+                break
+        for handle in self._files.values(): handle.close()
+        self._files.clear()
+
+    def _append(self, profile_id: str, text: str):
+        handle = self._files.get(profile_id)
+        if handle is None:
+            profile_dir = os.path.join(self.logs_dir, profile_id)
+            os.makedirs(profile_dir, exist_ok=True)
+            handle = self._files[profile_id] = open(os.path.join(profile_dir, CURRENT_LOG_NAME), 'a', encoding='utf-8')
+        handle.write(text)
+        handle.flush()
+        if self.max_bytes and handle.tell() >= self.max_bytes:
+            self._rotate(profile_id)
+
+    def _rotate(self, profile_id: str):
+        self._files.pop(profile_id).close()
+        profile_dir = os.path.join(self.logs_dir, profile_id)
+        current = os.path.join(profile_dir, CURRENT_LOG_NAME)
+        stamp, seq = time.strftime('%Y%m%d-%H%M%S'), 0
+        while os.path.exists(archive := os.path.join(profile_dir, f"{stamp}-{seq:03d}.log.gz")): seq += 1
+        with open(current, 'rb') as src, gzip.open(archive, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(current)
+        for old in archived_logs(profile_id, self.logs_dir)[self.backup_count:]:
+            os.remove(old)
+
+
+def archived_logs(profile_id: str, logs_dir: str = LOGS_DIR) -> list[str]:
+    """返回该主播已压缩的历史日志，新的在前。"""
+    profile_dir = os.path.join(logs_dir, profile_id)
+    if not os.path.isdir(profile_dir): return []
+    names = sorted((n for n in os.listdir(profile_dir) if n.endswith('.log.gz')), reverse=True)
+    return [os.path.join(profile_dir, n) for n in names]
+
+
+def _tail_file(path: str, lines: int, block_size: int = 8192) -> list[str]:
+    # 从档案末尾往前按块读取，只读取足够的行数，不载入整个档案
+    if lines <= 0: return []  # [-0:] 会取回整个档案
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return data.decode('utf-8', errors='replace').splitlines()[-lines:]
+
+
+def tail(profile_id: str, lines: int = 200, logs_dir: str = LOGS_DIR) -> list[str]:
+    """读取该主播最近的 lines 行日志；当前档案行数不足时再从最近一份压缩档补齐。"""
+    if lines <= 0: return []
+    current = os.path.join(logs_dir, profile_id, CURRENT_LOG_NAME)
+    result = _tail_file(current, lines) if os.path.exists(current) else []
+    if len(result) < lines:
+        archives = archived_logs(profile_id, logs_dir)
+        if archives:
+            # 压缩档无法从末尾往前读，逐行解压并只保留需要的最后几行
+            with gzip.open(archives[0], 'rt', encoding='utf-8', errors='replace') as f:
+                older = deque((line.rstrip('\n') for line in f), maxlen=lines - len(result))
+            result = list(older) + result
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看主播的持久化日志")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('tail')
+    p.add_argument('douyin_id')
+    p.add_argument('-n', '--lines', type=int, default=100)
+    p.add_argument('-f', '--follow', action='store_true', help="持续输出新增的日志")
+    p.add_argument('--logs-dir', default=LOGS_DIR)
+    args = parser.parse_args()
+
+    for line in tail(args.douyin_id, args.lines, args.logs_dir): print(line)
+    if not args.follow: return
+    current = os.path.join(args.logs_dir, args.douyin_id, CURRENT_LOG_NAME)
+    position = os.path.getsize(current) if os.path.exists(current) else 0
+    try:
+        while True:
+            time.sleep(1)
+            if not os.path.exists(current): position = 0; continue
+            size = os.path.getsize(current)
+            if size < position: position = 0  # 已轮替
+            if size > position:
+                with open(current, 'r', encoding='utf-8', errors='replace') as f:
+                    f.seek(position)
+                    sys.stdout.write(f.read())
+                    position = f.tell()
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,11 @@ import json
 from datetime import datetime
 from configobj import ConfigObj
 from tkinter import filedialog, messagebox
+from logstore import LogWriter, tail as tail_log
+import supervisor
+import checkpoint
+from proxypool import ProxyPool, format_stats as format_proxy_stats
+from resmon import ResourceMonitor, sparkline
 
 # ---【路径修正：第一部分】---
 # 获取 manager.py 自身的绝对目录
@@ -22,17 +27,44 @@ CREDENTIALS_DIR = os.path.join(script_dir, 'credentials')
 GROUPS_FILE = os.path.join(script_dir, 'groups.json')
 BASE_CONFIG_TEMPLATE = os.path.join(script_dir, 'yt.ini')
 STREAMER_SCRIPT_PATH = os.path.join(script_dir, 'streamer.py')
+MANAGER_CONFIG_PATH = os.path.join(script_dir, 'manager.ini')
+LOGS_DIR = os.path.join(script_dir, 'logs')
+PROXIES_FILE = os.path.join(script_dir, 'proxies.json')
+PROXY_POOL_DB_PATH = os.path.join(script_dir, 'proxy_pool.db')
 # ---【修正结束】---
 
+# 主控台自身的设定 (manager.ini)，缺少的项目会以预设值自动补上
+MANAGER_DEFAULTS = {
+    "Logging": {"max_size_mb": "10", "backup_count": "5", "ui_max_lines": "5000"},
+    "Bulk": {"ramp_interval": "2", "spread_first_checks": "true"},
+    "Supervisor": {"stop_timeout": "10", "reap_orphans_on_start": "true"},
+    "ProxyPool": {"probe_interval": "300", "probe_url": "https://live.douyin.com/", "probe_timeout": "10"},
+    "Bandwidth": {"node_bandwidth_kbps": "0"},
+    "Resources": {"sample_interval": "5", "history": "60", "cpu_percent": "200", "rss_mb": "2048", "rss_growth_mb": "300", "fds": "1024", "alert_interval": "600"},
+}
+
+def load_manager_settings():
+    conf = ConfigObj(MANAGER_CONFIG_PATH, encoding='UTF8', indent_type='  ')
+    changed = False
+    for section, options in MANAGER_DEFAULTS.items():
+        if section not in conf: conf[section] = {}; changed = True
+        for key, value in options.items():
+            if key not in conf[section]: conf[section][key] = value; changed = True
+    if changed:
+        try: conf.write()
+        except Exception: pass
+    return conf
+
 # ====================================================================
 #                      设定项中文翻译字典
 # ====================================================================
 TRANSLATIONS = {
-    "Douyin": {"douyin_id": "抖音主播ID", "wait_time": "页面加载等待时间 (秒)", "check_interval": "直播检测间隔 (秒)"},
+    "Douyin": {"douyin_id": "抖音主播ID", "wait_time": "页面加载等待时间 (秒)", "check_interval": "直播检测间隔 (秒)", "cache_ttl": "共享检测快取时间 (秒)", "stream_quality": "优先画质 (origin/FULL_HD/HD/SD/LD)", "max_bitrate_kbps": "码率上限 (kbps, 0=不限)", "browser_keepalive": "浏览器保留时间 (秒, 0=用完即关)"},
     "YouTube": {"token_file": "凭证档案 (credentials/)", "broadcast_title": "直播标题", "broadcast_description": "直播说明/描述", "category_id": "直播分类ID", "privacy_status": "隐私状态", "enable_auto_start": "自动开始直播", "enable_auto_stop": "自动结束直播", "enable_dvr": "启用 DVR (回看功能)", "record_from_start": "从推流开始录製"},
-    "FFmpeg": {"ffmpeg_path": "ffmpeg程式路径", "bitrate": "影片码率 (例如 4000k)"},
+    "FFmpeg": {"ffmpeg_path": "ffmpeg程式路径", "bitrate": "影片码率 (例如 4000k)", "start_timeout": "推流启动确认超时 (秒)", "reattach": "重启后接管推流 (true/false)"},
     "System": {"chrome_path": "浏览器程式路径"},
-    "Proxy": {"proxy_url": "代理伺服器URL (http/socks5)"},
+    "Proxy": {"proxy_url": "代理伺服器URL (http/socks5)", "proxy_pool": "代理池 (all 或代理名称, 逗号分隔)", "proxy_timeout": "代理页面导航超时 (秒)"},
+    "Logging": {"log_level": "日志等级 (DEBUG/INFO/WARN/ERROR)"},
     "Custom": {"remarks": "主播备注", "group": "主播分组"},
 }
 
@@ -54,6 +86,12 @@ class EditSettingsWindow(ctk.CTkToplevel):
             self.log_to_main(f"错误: 无法加载设定档 {self.config_filepath}: {e}")
             self.destroy()
             return
+        try:
+            # 旧设定档缺少后来新增的项目时，以范本 yt.ini 的预设值显示，而不是空白
+            self.defaults = ConfigObj(BASE_CONFIG_TEMPLATE, encoding='UTF8')
+        except Exception:
+            self.defaults = {}
+        self.initial_values = {}
             
         douyin_id = self.config.get('Douyin', {}).get('douyin_id', os.path.basename(profile_path))
         self.title(f"修改设定 - {douyin_id}")
@@ -83,12 +121,13 @@ class EditSettingsWindow(ctk.CTkToplevel):
             scrollable_frame.pack(expand=True, fill="both", padx=5, pady=5)
             scrollable_frame.grid_columnconfigure(1, weight=1)
             self.widgets[section] = {}
+            self.initial_values[section] = {}
 
             for i, (option_key, label_text) in enumerate(options.items()):
                 label = ctk.CTkLabel(scrollable_frame, text=label_text, anchor="w")
                 label.grid(row=i, column=0, padx=10, pady=8, sticky="w")
                 
-                value = self.config.get(section, {}).get(option_key, "")
+                value = self.config.get(section, {}).get(option_key, self.defaults.get(section, {}).get(option_key, ""))
                 widget_container = self.create_widget_for_option(scrollable_frame, section, option_key, value)
                 widget_container.grid(row=i, column=1, padx=10, pady=8, sticky="ew")
 
@@ -135,6 +174,7 @@ class EditSettingsWindow(ctk.CTkToplevel):
             main_widget = entry
 
         self.widgets[section][option] = main_widget
+        self.initial_values[section][option] = self.widget_value(option, main_widget)
         return container
 
     def browse_file(self, entry_widget):
@@ -153,19 +193,26 @@ class EditSettingsWindow(ctk.CTkToplevel):
             filename = os.path.basename(filepath)
             self.token_label.configure(text=filename)
 
+    def widget_value(self, option, widget) -> str:
+        if isinstance(widget, ctk.CTkSwitch): return "true" if widget.get() else "false"
+        if isinstance(widget, ctk.CTkTextbox): return widget.get("1.0", "end-1c")
+        if isinstance(widget, ctk.CTkLabel) and option == 'token_file': return widget.cget("text")
+        return str(widget.get())
+
     def save_and_close(self):
-        for section, widgets_info in self.widgets.items():
-            if section not in self.config: self.config[section] = {}
-            for option, widget in widgets_info.items():
-                value = ""
-                if isinstance(widget, ctk.CTkSwitch): value = "true" if widget.get() else "false"
-                elif isinstance(widget, ctk.CTkTextbox): value = widget.get("1.0", "end-1c")
-                elif isinstance(widget, ctk.CTkLabel) and option == 'token_file': value = widget.cget("text")
-                else: value = widget.get()
-                self.config[section][option] = str(value)
         try:
+            # 储存前重新读取档案，只写入有修改的项目：视窗开着的期间主控台可能已更新备注 (直播标题) 或分组
+            self.config = ConfigObj(self.config_filepath, encoding='UTF8', indent_type='  ')
+            for section, widgets_info in self.widgets.items():
+                for option, widget in widgets_info.items():
+                    value = self.widget_value(option, widget)
+                    if value == self.initial_values[section][option]: continue
+                    if section not in self.config: self.config[section] = {}
+                    self.config[section][option] = value
             self.config.write()
             self.log_to_main(f"已储存主播 {os.path.basename(self.profile_path)} 的设定。", "INFO")
+            if os.path.basename(self.profile_path) in getattr(self.master, 'running_processes', {}):
+                self.log_to_main("该主播正在运行，新设定会自动套用；需要重启才能生效的项目会另行提示。", "INFO")
         except Exception as e:
             self.log_to_main(f"储存设定档失败: {e}")
         
@@ -302,6 +349,56 @@ class GroupManagerWindow(ctk.CTkToplevel):
         self.master.discover_and_refresh()
         self.destroy()
 
+# ====================================================================
+#                        日志查看视窗
+# ====================================================================
+class LogViewerWindow(ctk.CTkToplevel):
+    def __init__(self, master, douyin_id, lines=500):
+        super().__init__(master)
+        self.douyin_id = douyin_id
+        self.lines = lines
+        self.title(f"历史日志 - {douyin_id}")
+        self.geometry("900x600")
+        self.transient(master)
+        button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=(10, 0))
+        ctk.CTkLabel(button_frame, text=f"最近 {lines} 行 (logs/{douyin_id}/)").pack(side="left")
+        ctk.CTkButton(button_frame, text="↻ 刷新", width=80, command=self.reload).pack(side="right")
+        self.textbox = ctk.CTkTextbox(self, wrap="none", font=("", 12))
+        self.textbox.pack(expand=True, fill="both", padx=10, pady=10)
+        self.reload()
+
+    def reload(self):
+        try:
+            content = "\n".join(tail_log(self.douyin_id, self.lines, logs_dir=LOGS_DIR))
+        except Exception as e:
+            content = f"读取日志失败: {e}"
+        self.textbox.configure(state="normal"); self.textbox.delete("1.0", "end"); self.textbox.insert("end", content); self.textbox.see("end"); self.textbox.configure(state="disabled")
+
+class ProxyPoolWindow(ctk.CTkToplevel):
+    def __init__(self, master, pool):
+        super().__init__(master)
+        self.manager = master
+        self.pool = pool
+        self.title("代理池")
+        self.geometry("1000x450")
+        self.transient(master)
+        button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=(10, 0))
+        ctk.CTkLabel(button_frame, text="评分 = 平均延迟 / 成功率 (越小越好)；耗时为各主播抓取时累计花在此代理上的时间").pack(side="left")
+        ctk.CTkButton(button_frame, text="↻ 刷新", width=80, command=self.reload).pack(side="right")
+        ctk.CTkButton(button_frame, text="📡 立即探测", width=90, fg_color="gray", command=self.manager.probe_proxies_now).pack(side="right", padx=5)
+        self.textbox = ctk.CTkTextbox(self, wrap="none", font=("Courier New", 12))
+        self.textbox.pack(expand=True, fill="both", padx=10, pady=10)
+        self.reload()
+
+    def reload(self):
+        try:
+            content = format_proxy_stats(self.pool.stats()) if self.pool.proxies() else "代理清单为空，请在 proxies.json 中加入代理。"
+        except Exception as e:
+            content = f"读取代理池失败: {e}"
+        self.textbox.configure(state="normal"); self.textbox.delete("1.0", "end"); self.textbox.insert("end", content); self.textbox.configure(state="disabled")
+
 # ====================================================================
 #                        主播卡片类别
 # ====================================================================
@@ -337,6 +434,10 @@ class StreamerCard(ctk.CTkFrame):
         self.status_label.pack(side="left")
         self.duration_label = ctk.CTkLabel(middle_info_frame, text="时长: --:--:--", font=("", 12), anchor="w")
         self.duration_label.pack(side="left", padx=10)
+        self.notice_label = ctk.CTkLabel(middle_info_frame, text="", font=("", 12), text_color="#F9A825", anchor="w")
+        self.notice_label.pack(side="left", padx=10)
+        self.resource_label = ctk.CTkLabel(info_frame, text="", font=("Courier New", 11), text_color="gray", justify="left", anchor="w")
+        self.resource_label.pack(fill="x")
         remarks = self.config.get('Custom', {}).get('remarks', '无备注')
         self.remarks_label = ctk.CTkLabel(info_frame, text=f"备注: {remarks}", justify="left", wraplength=400, anchor="w", fg_color="transparent")
         self.remarks_label.pack(fill="x", pady=(0,5))
@@ -348,10 +449,15 @@ class StreamerCard(ctk.CTkFrame):
         self.stop_button.pack(pady=3, fill="x")
         self.settings_button = ctk.CTkButton(button_frame, text="⚙️ 设定", width=80, fg_color="gray", command=lambda: self.manager.edit_settings(self.profile_path))
         self.settings_button.pack(pady=3, fill="x")
+        self.logs_button = ctk.CTkButton(button_frame, text="📜 日志", width=80, fg_color="gray", command=lambda: LogViewerWindow(self.manager, self.douyin_id))
+        self.logs_button.pack(pady=3, fill="x")
         self.delete_button = ctk.CTkButton(button_frame, text="🗑️ 删除", width=80, fg_color="#c0392b", hover_color="#e74c3c", command=lambda: self.manager.delete_streamer(self.douyin_id, self.profile_path))
         self.delete_button.pack(pady=(10, 3), fill="x")
     def update_group(self, new_group):
         try:
+            # 重新读取再写入，只改分组：运行期间备注可能已被直播标题更新
+            self.config = ConfigObj(os.path.join(self.profile_path, 'config.ini'), encoding='UTF8', indent_type='  ')
+            if 'Custom' not in self.config: self.config['Custom'] = {}
             self.config['Custom']['group'] = new_group
             self.config.write()
             self.manager.log(f"主播 {self.douyin_id} 的分组已更新为 '{new_group}'。", "INFO")
@@ -369,48 +475,80 @@ class ManagerApp(ctk.CTk):
         self.geometry("950x750")
 
         self.check_files()
+        self.settings = load_manager_settings()
+        log_settings = self.settings['Logging']
+        self.ui_max_lines = int(log_settings.get('ui_max_lines', 5000))
+        self.log_writer = LogWriter(logs_dir=LOGS_DIR, max_bytes=int(float(log_settings.get('max_size_mb', 10)) * 1024 * 1024), backup_count=int(log_settings.get('backup_count', 5)))
         
         self.running_processes = {}
         self.streamer_cards = {}
         self.log_queue = queue.Queue()
         self.groups = []
         self.current_filter = ctk.StringVar(value="All Groups")
+        self.bulk_plan = []
+        self.bulk_job = None
+        self.stop_timeout = float(self.settings['Supervisor'].get('stop_timeout', 10))
+        self.resource_monitor = ResourceMonitor(history=int(self.settings['Resources'].get('history', 60)))
+        self.resource_alerts = {}
+        self.closing = threading.Event()
+        try:
+            self.proxy_pool = ProxyPool(db_path=PROXY_POOL_DB_PATH, proxies_file=PROXIES_FILE)
+        except Exception as e:
+            self.proxy_pool = None
+            self.log(f"无法开启代理池: {e}", "ERROR")
 
         self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(1, weight=1)
-        self.grid_rowconfigure(2, weight=0)
-        self.grid_rowconfigure(3, weight=0, minsize=200)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_rowconfigure(3, weight=0)
+        self.grid_rowconfigure(4, weight=0, minsize=200)
 
         top_frame = ctk.CTkFrame(self)
         top_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
         ctk.CTkButton(top_frame, text="✚ 新建直播", command=self.create_new_streamer).pack(side="left", padx=5)
         ctk.CTkButton(top_frame, text="↻ 刷新列表", command=self.discover_and_refresh).pack(side="left", padx=5)
         ctk.CTkButton(top_frame, text="🗂️ 管理分组", command=self.open_group_manager).pack(side="left", padx=5)
+        ctk.CTkButton(top_frame, text="🌐 代理池", command=self.open_proxy_pool).pack(side="left", padx=5)
         ctk.CTkLabel(top_frame, text="").pack(side="left", expand=True) # Spacer
         ctk.CTkLabel(top_frame, text="筛选:").pack(side="left", padx=(15, 5))
         self.group_filter_menu = ctk.CTkOptionMenu(top_frame, variable=self.current_filter, command=lambda _: self.refresh_streamer_list())
         self.group_filter_menu.pack(side="left", padx=5)
 
+        # 批量操作：作用于当前筛选的分组 (All Groups 即全部主播)
+        bulk_frame = ctk.CTkFrame(self, fg_color="transparent")
+        bulk_frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="ew")
+        ctk.CTkButton(bulk_frame, text="▶ 批量启动", width=100, command=self.bulk_start).pack(side="left", padx=5)
+        ctk.CTkButton(bulk_frame, text="■ 批量停止", width=100, fg_color="#D32F2F", hover_color="#B71C1C", command=self.bulk_stop_filtered).pack(side="left", padx=5)
+        ctk.CTkButton(bulk_frame, text="↻ 批量重启", width=100, fg_color="gray", command=self.bulk_restart).pack(side="left", padx=5)
+        self.bulk_progress_label = ctk.CTkLabel(bulk_frame, text="", anchor="w")
+        self.bulk_progress_label.pack(side="left", padx=15)
+
         self.dashboard_frame = ctk.CTkScrollableFrame(self, label_text="主播仪表板")
-        self.dashboard_frame.grid(row=1, column=0, padx=10, pady=0, sticky="nsew")
+        self.dashboard_frame.grid(row=2, column=0, padx=10, pady=0, sticky="nsew")
         self.dashboard_frame.grid_columnconfigure(0, weight=1)
 
         log_label_frame = ctk.CTkFrame(self, fg_color="transparent")
-        log_label_frame.grid(row=2, column=0, padx=10, pady=(10, 0), sticky="ew")
+        log_label_frame.grid(row=3, column=0, padx=10, pady=(10, 0), sticky="ew")
         ctk.CTkLabel(log_label_frame, text="统一日志中心", font=("", 14, "bold")).pack(side="left")
         ctk.CTkButton(log_label_frame, text="🧹 清理日志", width=80, command=self.clear_logs).pack(side="right")
 
         self.log_textbox = ctk.CTkTextbox(self, state="disabled", wrap="word", font=("", 13))
-        self.log_textbox.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        self.log_textbox.grid(row=4, column=0, padx=10, pady=(0, 10), sticky="nsew")
         
         mode = ctk.get_appearance_mode()
         if mode == "Dark": info_color, warn_color, error_color, manager_color = "#FFFFFF", "#FFD700", "#FF6347", "#87CEFA"
         else: info_color, warn_color, error_color, manager_color = "#333333", "#FF8C00", "#B22222", "#00008B"
         self.log_textbox.tag_config("INFO", foreground=info_color); self.log_textbox.tag_config("WARN", foreground=warn_color); self.log_textbox.tag_config("ERROR", foreground=error_color); self.log_textbox.tag_config("DEBUG", foreground="gray"); self.log_textbox.tag_config("MANAGER", foreground=manager_color)
 
+        live_sessions = self.find_live_sessions()
+        if str(self.settings['Supervisor'].get('reap_orphans_on_start', 'true')).lower() == 'true': self.reap_orphans(live_sessions)
         self.discover_and_refresh()
+        self.resume_sessions(live_sessions)
         self.check_log_queue()
         self.update_durations()
+        if self.proxy_pool and float(self.settings['ProxyPool'].get('probe_interval', 300)) > 0:
+            threading.Thread(target=self.probe_proxies_loop, daemon=True).start()
+        if supervisor.HAS_PROC and float(self.settings['Resources'].get('sample_interval', 5)) > 0:
+            threading.Thread(target=self.sample_resources_loop, daemon=True).start()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def check_files(self):
@@ -422,22 +560,143 @@ class ManagerApp(ctk.CTk):
                 json.dump(["默认分组"], f, ensure_ascii=False, indent=4)
             messagebox.showinfo("提示", "已为您自动建立 'groups.json' 分组设定档。")
 
+    def find_live_sessions(self):
+        """返回 FFmpeg 仍在推流的检查点 {主播ID: 检查点}，这些推流可由重启的工作进程接管。"""
+        sessions = {}
+        if not checkpoint.SUPPORTED or not os.path.isdir(PROFILES_DIR): return sessions
+        for profile_id in os.listdir(PROFILES_DIR):
+            state = checkpoint.load_live(os.path.join(PROFILES_DIR, profile_id))
+            if state: sessions[profile_id] = state
+        return sessions
+
+    def resume_sessions(self, live_sessions):
+        for douyin_id, state in live_sessions.items():
+            card = self.streamer_cards.get(douyin_id)
+            if not card or douyin_id in self.running_processes: continue
+            self.log(f"🔗 主播 {douyin_id} 的推流仍在进行 (FFmpeg PID: {state['ffmpeg_pid']})，正在启动工作进程接管。")
+            self.start_streamer(card.profile_path, douyin_id)
+
+    def reap_orphans(self, live_sessions=None):
+        # 上一次主控台异常退出时遗留的工作进程 / FFmpeg / 浏览器，依 run/ 下的 pidfile 回收 (待接管的 FFmpeg 除外)
+        spare = {douyin_id: {state['ffmpeg_pid']} for douyin_id, state in (live_sessions or {}).items()}
+        try:
+            reaped = supervisor.reap_orphans(timeout=self.stop_timeout, spare=spare)
+        except Exception as e:
+            self.log(f"回收残留进程时发生错误: {e}", "ERROR"); return
+        if reaped: self.log(f"🧹 已回收上次遗留的 {sum(reaped.values())} 个进程 (主播: {', '.join(reaped)})。", "WARN")
+
     def open_group_manager(self): GroupManagerWindow(self)
-    def log(self, message, level="MANAGER"): self.log_queue.put((f"[{time.strftime('%H:%M:%S')}] {message}", level.upper()))
+    def open_proxy_pool(self):
+        if self.proxy_pool: ProxyPoolWindow(self, self.proxy_pool)
+        else: self.log("代理池未能开启。", "ERROR")
+
+    # ---------------- 资源统计 ----------------
+    def sample_resources_loop(self):
+        # 在背景执行绪中取样 (每次只扫描一次 /proc)，结果交回主执行绪更新卡片
+        interval = float(self.settings['Resources'].get('sample_interval', 5))
+        while not self.closing.wait(interval):
+            targets = {}
+            for douyin_id, info in dict(self.running_processes).items():
+                target = {'pid': info['process'].pid, 'marker': info.get('marker')}
+                state = checkpoint.load_live(info['profile_path']) if info.get('profile_path') else None
+                if state: target['extra'] = {state['ffmpeg_pid']}  # 接管来的 FFmpeg 不在工作进程的进程树中
+                targets[douyin_id] = target
+            try:
+                samples = self.resource_monitor.sample(targets)
+            except Exception as e:
+                self.log(f"资源取样失败: {e}", "ERROR"); continue
+            self.check_resource_alerts(samples)
+            # 走势图也在取样执行绪中产生：历史记录只由本执行绪读写，主执行绪只拿到字串
+            texts = {douyin_id: self.format_resource_text(douyin_id, sample) for douyin_id, sample in samples.items()}
+            self.after(0, self.update_resource_ui, texts)
+
+    def check_resource_alerts(self, samples):
+        limits = self.settings['Resources']
+        alert_interval = float(limits.get('alert_interval', 600))
+        now = time.time()
+        for douyin_id, sample in samples.items():
+            alerts = []
+            recent_cpu = self.resource_monitor.series(douyin_id, 'cpu_percent')[-3:]
+            if len(recent_cpu) == 3 and min(recent_cpu) > float(limits.get('cpu_percent', 200)):
+                alerts.append(('cpu', f"CPU 持续高于 {limits.get('cpu_percent')}% (目前 {sample['cpu_percent']:.0f}%)"))
+            if sample['rss_mb'] > float(limits.get('rss_mb', 2048)):
+                alerts.append(('rss', f"记忆体 {sample['rss_mb']:.0f} MB 超过 {limits.get('rss_mb')} MB"))
+            growth = self.resource_monitor.rss_growth(douyin_id)
+            if growth is not None and growth > float(limits.get('rss_growth_mb', 300)):
+                window = float(limits.get('sample_interval', 5)) * self.resource_monitor.history / 60
+                alerts.append(('leak', f"记忆体在最近 {window:.0f} 分钟内持续增长 {growth:.0f} MB，疑似泄漏"))
+            if sample['fds'] > int(limits.get('fds', 1024)):
+                alerts.append(('fds', f"打开的档案描述符 {sample['fds']} 个超过 {limits.get('fds')}"))
+            for kind, message in alerts:
+                # 同一主播的同一类告警在 alert_interval 秒内只记录一次
+                if now - self.resource_alerts.get((douyin_id, kind), 0) < alert_interval: continue
+                self.resource_alerts[(douyin_id, kind)] = now
+                self.log(f"📈 [{douyin_id}] 资源告警: {message}", "WARN")
+
+    def format_resource_text(self, douyin_id, sample):
+        cpu, rss = self.resource_monitor.series(douyin_id, 'cpu_percent'), self.resource_monitor.series(douyin_id, 'rss_mb')
+        io = lambda kbps: f"{kbps / 1000:.1f}M" if kbps >= 1000 else f"{kbps:.0f}k"
+        return (f"CPU {sample['cpu_percent']:5.1f}% {sparkline(cpu, 15):<15}  内存 {sample['rss_mb']:6.0f}MB {sparkline(rss, 15):<15}  "
+                f"FD {sample['fds']:<4}  IO ↓{io(sample['read_kbps'])} ↑{io(sample['write_kbps'])}bps  进程 {sample['procs']}")
+
+    def update_resource_ui(self, texts):
+        for douyin_id, card in self.streamer_cards.items():
+            text = texts.get(douyin_id)
+            if text is None:
+                if douyin_id not in self.running_processes: card.resource_label.configure(text="")
+                continue
+            card.resource_label.configure(text=text)
+
+    # ---------------- 代理池探测 ----------------
+    def probe_proxies_loop(self):
+        # 定期探测所有代理，即使没有主播在抓取也能持续更新评分与冷却状态
+        interval = float(self.settings['ProxyPool'].get('probe_interval', 300))
+        while not self.closing.wait(interval):
+            self._probe_proxies()
+
+    def probe_proxies_now(self):
+        if self.proxy_pool: threading.Thread(target=self._probe_proxies, args=(True,), daemon=True).start()
+
+    def _probe_proxies(self, verbose=False):
+        if not self.proxy_pool.proxies(): return
+        settings = self.settings['ProxyPool']
+        try:
+            results = self.proxy_pool.probe_all(settings.get('probe_url', 'https://live.douyin.com/'), float(settings.get('probe_timeout', 10)))
+        except Exception as e:
+            self.log(f"探测代理时发生错误: {e}", "ERROR"); return
+        failed = {name: outcome for name, outcome in results.items() if outcome != 'ok'}
+        if failed: self.log(f"🌐 代理探测: {len(results) - len(failed)}/{len(results)} 可用，异常: " + ", ".join(f"{name}({'被拦截' if outcome == 'blocked' else '失败'})" for name, outcome in failed.items()), "WARN")
+        elif verbose: self.log(f"🌐 代理探测: {len(results)} 个代理全部可用。")
+    def log(self, message, level="MANAGER", persist=True):
+        if persist: self.log_writer.write("_manager", f"[{level.upper()}] {message}")
+        self.log_queue.put((f"[{time.strftime('%H:%M:%S')}] {message}", level.upper()))
     def clear_logs(self): self.log_textbox.configure(state="normal"); self.log_textbox.delete("1.0", "end"); self.log_textbox.configure(state="disabled")
 
     def check_log_queue(self):
+        # 每次最多取 2000 条，并把相邻同等级的日志合併成一次 insert，减少对文字框的操作
+        batch = []
         try:
-            while True:
+            while len(batch) < 2000:
                 message, level = self.log_queue.get_nowait()
-                self.log_textbox.configure(state="normal"); self.log_textbox.insert("end", message + "\n", level); self.log_textbox.see("end"); self.log_textbox.configure(state="disabled")
+                if batch and batch[-1][1] == level: batch[-1][0].append(message)
+                else: batch.append(([message], level))
         except queue.Empty: pass
+        try:
+            if batch: self._append_logs(batch)
         finally: self.after(250, self.check_log_queue)
+
+    def _append_logs(self, batch):
+        self.log_textbox.configure(state="normal")
+        for messages, level in batch: self.log_textbox.insert("end", "\n".join(messages) + "\n", level)
+        overflow = int(self.log_textbox.index("end-1c").split(".")[0]) - self.ui_max_lines
+        if overflow > 0: self.log_textbox.delete("1.0", f"{overflow + 1}.0")
+        self.log_textbox.see("end"); self.log_textbox.configure(state="disabled")
     
     def update_durations(self):
         for douyin_id, info in self.running_processes.items():
             if 'start_time' in info and douyin_id in self.streamer_cards:
-                duration = int(time.time() - info['start_time'])
+                # 推流中以工作进程回报的会话开始时间计算，接管后的推流会延续原来的时长
+                duration = int(time.time() - info.get('session_start', info['start_time']))
                 hours, remainder = divmod(duration, 3600)
                 minutes, seconds = divmod(remainder, 60)
                 self.streamer_cards[douyin_id].duration_label.configure(text=f"时长: {hours:02}:{minutes:02}:{seconds:02}")
@@ -481,16 +740,20 @@ class ManagerApp(ctk.CTk):
             self.update_ui_for_process(douyin_id, is_running=True)
             if 'status' in self.running_processes[douyin_id]:
                 self.update_status_ui(douyin_id, self.running_processes[douyin_id]['status'])
+            self.show_restart_notice(douyin_id, self.running_processes[douyin_id].get('restart_required', ''))
     
-    def start_streamer(self, profile_path, douyin_id):
+    def start_streamer(self, profile_path, douyin_id, initial_delay=0):
+        if self.closing.is_set(): return
         if douyin_id in self.running_processes: self.log(f"主播 {douyin_id} 已经在运行中。", "WARN"); return
-        creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-        # ---【路径修正】---
-        command = [sys.executable, "-u", STREAMER_SCRIPT_PATH, profile_path]
+        command = self.worker_command(profile_path, initial_delay)
+        marker = supervisor.new_marker()
         
         try:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='ignore', creationflags=creationflags)
-            self.running_processes[douyin_id] = {'process': process, 'status': 'starting', 'start_time': time.time()}
+            # 工作进程在独立的进程组中启动，并带上标记，停止时可连同 FFmpeg / 浏览器整棵进程树一起结束
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='ignore', env=supervisor.worker_env(marker, detachable=True), **supervisor.popen_kwargs())
+            self.running_processes[douyin_id] = {'process': process, 'marker': marker, 'profile_path': profile_path, 'status': 'starting', 'start_time': time.time()}
+            try: supervisor.write_pidfile(douyin_id, process.pid, marker)
+            except OSError as e: self.log(f"无法写入主播 {douyin_id} 的 pidfile: {e}", "WARN")
             threading.Thread(target=self.read_output, args=(douyin_id, process), daemon=True).start()
             self.log(f"已启动主播 {douyin_id} (PID: {process.pid})")
             self.update_ui_for_process(douyin_id, is_running=True)
@@ -500,38 +763,182 @@ class ManagerApp(ctk.CTk):
         except Exception as e:
             self.log(f"启动主播 {douyin_id} 时发生未知错误: {e}", "ERROR")
 
+    def worker_command(self, profile_path, initial_delay=0):
+        # ---【路径修正】---
+        command = [sys.executable, "-u", STREAMER_SCRIPT_PATH, profile_path]
+        if initial_delay > 0: command.append(f"--initial-delay={initial_delay:.0f}")
+        return command
+
     def read_output(self, douyin_id, process):
         for line in iter(process.stdout.readline, ''):
             line = line.strip()
             if not line: continue
+            self.log_writer.write(douyin_id, line)
             if line.startswith("STATUS:"):
                 status = line.split(":", 1)[1]
                 if douyin_id in self.running_processes: self.running_processes[douyin_id]['status'] = status
                 self.after(0, self.update_status_ui, douyin_id, status)
+            elif line.startswith("SESSION:"):
+                value = line.split(":", 1)[1]
+                info = self.running_processes.get(douyin_id)
+                if info is not None and info.get('process') is process:
+                    if value: info['session_start'] = float(value)
+                    else: info.pop('session_start', None)
+            elif line.startswith("RESTART_REQUIRED:"):
+                keys = line.split(":", 1)[1]
+                if douyin_id in self.running_processes: self.running_processes[douyin_id]['restart_required'] = keys
+                self.after(0, self.show_restart_notice, douyin_id, keys)
             elif line.startswith("TITLE:"):
                 title = line.split(":", 1)[1]
                 self.after(0, self.update_remarks_with_title, douyin_id, title)
             elif line.startswith("LOG:"):
                 parts = line.split(":", 2)
                 level, message = (parts[1], parts[2]) if len(parts) > 2 else ("INFO", parts[0])
-                self.log(f"[{douyin_id}] {message}", level)
-            else: self.log(f"[{douyin_id}] {line}", "DEBUG")
+                self.log(f"[{douyin_id}] {message}", level, persist=False)
+            else: self.log(f"[{douyin_id}] {line}", "DEBUG", persist=False)
         process.wait()
-        if douyin_id in self.running_processes:
+        # 只处理自己这个进程的记录，避免重启后把新进程的记录删掉
+        if self.running_processes.get(douyin_id, {}).get('process') is process:
+            info = self.running_processes[douyin_id]
             self.log(f"检测到主播 {douyin_id} 的程序已终止。")
+            # 工作进程意外退出但 FFmpeg 仍在推流：保留 FFmpeg 并重启工作进程接管 (运行不足 60 秒的不重启，避免反复崩溃)
+            state = checkpoint.load_live(info['profile_path'])
+            resume = state is not None and time.time() - info['start_time'] >= 60
+            leftovers = supervisor.reap_tree(process.pid, info.get('marker'), self.stop_timeout, spare={state['ffmpeg_pid']} if resume else ())
+            if leftovers: self.log(f"🧹 已清理主播 {douyin_id} 遗留的 {leftovers} 个子进程。", "WARN")
+            supervisor.remove_pidfile(douyin_id, process.pid)
             del self.running_processes[douyin_id]
+            if resume:
+                self.log(f"🔗 主播 {douyin_id} 的 FFmpeg 仍在推流，正在重启工作进程接管。", "WARN")
+                self.after(0, self.start_streamer, info['profile_path'], douyin_id)
+                return
+            if state:
+                supervisor.shutdown_many([{'id': douyin_id, 'pid': state['ffmpeg_pid'], 'marker': None}], timeout=self.stop_timeout)
+                checkpoint.clear(info['profile_path'])
             self.after(0, self.update_ui_for_process, douyin_id, False)
             self.after(0, self.update_status_ui, douyin_id, "stopped")
 
     def stop_streamer(self, douyin_id):
         if douyin_id in self.running_processes:
             process_info = self.running_processes.pop(douyin_id)
-            process_info['process'].terminate()
+            threading.Thread(target=self._shutdown, args=({douyin_id: process_info},), daemon=True).start()
             self.log(f"已发送停止信号给主播 {douyin_id}")
             self.update_ui_for_process(douyin_id, is_running=False)
             self.update_status_ui(douyin_id, "stopped")
         else: self.log(f"尝试停止主播 {douyin_id}，但他不在运行中。", "WARN")
 
+    def _shutdown(self, infos, detach=False):
+        """
+        同时停止多个工作进程的整棵进程树 (先 SIGTERM，逾时 SIGKILL)，返回逾时被强制结束的主播。
+        detach 为 True 时保留正在推流的 FFmpeg 与检查点，下次启动时由工作进程接管。
+        """
+        entries = []
+        for douyin_id, info in infos.items():
+            entry = {'id': douyin_id, 'pid': info['process'].pid, 'marker': info.get('marker'), 'process': info['process']}
+            state = checkpoint.load_live(info['profile_path']) if info.get('profile_path') else None
+            if state:
+                # 接管来的 FFmpeg 不在工作进程的进程树中，需另外指定
+                entry['spare' if detach else 'extra'] = {state['ffmpeg_pid']}
+            if detach and state:
+                try: os.kill(entry['pid'], supervisor.DETACH_SIGNAL)
+                except OSError: pass
+            entries.append(entry)
+        try:
+            results = supervisor.shutdown_many(entries, timeout=self.stop_timeout)
+        except Exception as e:
+            self.log(f"停止进程时发生错误: {e}", "ERROR")
+            for entry in entries: entry['process'].kill()
+            results = {entry['id']: 'killed' for entry in entries}
+        for entry in entries:
+            supervisor.remove_pidfile(entry['id'], entry['pid'])
+            if not detach and infos[entry['id']].get('profile_path'): checkpoint.clear(infos[entry['id']]['profile_path'])
+        killed = [douyin_id for douyin_id, result in results.items() if result == 'killed']
+        if killed and len(infos) == 1: self.log(f"主播 {killed[0]} 未在 {self.stop_timeout:.0f} 秒内退出，已强制结束。", "WARN")
+        return killed
+
+    # ---------------- 批量启动 / 停止 / 重启 ----------------
+    def _filtered_targets(self):
+        return [(card.profile_path, douyin_id) for douyin_id, card in self.streamer_cards.items()]
+
+    def _filter_name(self):
+        selected = self.current_filter.get()
+        return "全部主播" if selected == "All Groups" else f"分组 '{selected}'"
+
+    def set_bulk_progress(self, text):
+        self.bulk_progress_label.configure(text=text)
+
+    def bulk_start(self):
+        targets = [(path, douyin_id) for path, douyin_id in self._filtered_targets() if douyin_id not in self.running_processes]
+        if not targets: self.log(f"{self._filter_name()} 没有需要启动的主播。", "WARN"); return
+        self.log(f"开始批量启动 {self._filter_name()} 的 {len(targets)} 个主播。")
+        self._begin_ramp(targets)
+
+    def _begin_ramp(self, targets):
+        # 按 ramp_interval 逐个放行，并把各主播的首次检查错开分布在检测间隔内
+        if self.bulk_job: self.after_cancel(self.bulk_job); self.bulk_job = None
+        bulk_settings = self.settings['Bulk']
+        ramp = float(bulk_settings.get('ramp_interval', 2))
+        spread = str(bulk_settings.get('spread_first_checks', 'true')).lower() == 'true'
+        total = len(targets)
+        self.bulk_plan = []
+        for i, (profile_path, douyin_id) in enumerate(targets):
+            delay = 0.0
+            if spread:
+                try:
+                    check_interval = int(ConfigObj(os.path.join(profile_path, 'config.ini'), encoding='UTF8').get('Douyin', {}).get('check_interval', 60))
+                except Exception:
+                    check_interval = 60
+                delay = max(0.0, i * check_interval / total - i * ramp)
+            self.bulk_plan.append((profile_path, douyin_id, delay))
+        self.bulk_total, self.bulk_admitted = total, 0
+        self._admit_next(ramp)
+
+    def _admit_next(self, ramp):
+        self.bulk_job = None
+        if not self.bulk_plan:
+            self.set_bulk_progress("")
+            self.log(f"批量启动完成，共 {self.bulk_admitted} 个主播。")
+            return
+        profile_path, douyin_id, delay = self.bulk_plan.pop(0)
+        if douyin_id not in self.running_processes: self.start_streamer(profile_path, douyin_id, initial_delay=delay)
+        self.bulk_admitted += 1
+        self.set_bulk_progress(f"批量启动中: {self.bulk_admitted}/{self.bulk_total}")
+        self.bulk_job = self.after(int(ramp * 1000), self._admit_next, ramp)
+
+    def bulk_stop_filtered(self):
+        douyin_ids = [douyin_id for _, douyin_id in self._filtered_targets() if douyin_id in self.running_processes]
+        pending = [item for item in self.bulk_plan if item[1] in self.streamer_cards]
+        if not douyin_ids and not pending: self.log(f"{self._filter_name()} 没有正在运行的主播。", "WARN"); return
+        if not messagebox.askyesno("批量停止", f"确定要停止 {self._filter_name()} 的 {len(douyin_ids)} 个正在运行的主播吗？"): return
+        self.bulk_stop(douyin_ids)
+
+    def bulk_stop(self, douyin_ids, on_done=None):
+        # 取消尚未放行的批量启动，再同时向所有进程发送停止信号，并在背景限时等待
+        self.bulk_plan = [item for item in self.bulk_plan if item[1] not in self.streamer_cards]
+        if not self.bulk_plan and self.bulk_job: self.after_cancel(self.bulk_job); self.bulk_job = None
+        stopping = {}
+        for douyin_id in douyin_ids:
+            info = self.running_processes.pop(douyin_id, None)
+            if not info: continue
+            stopping[douyin_id] = info
+            self.update_ui_for_process(douyin_id, is_running=False)
+            self.update_status_ui(douyin_id, "stopped")
+        self.set_bulk_progress(f"批量停止中: 等待 {len(stopping)} 个进程结束...")
+        threading.Thread(target=self._wait_bulk_stopped, args=(stopping, on_done), daemon=True).start()
+
+    def _wait_bulk_stopped(self, stopping, on_done):
+        killed = self._shutdown(stopping)
+        self.log(f"批量停止完成: {len(stopping)} 个主播已停止" + (f"，其中 {len(killed)} 个逾时被强制结束: {', '.join(killed)}" if killed else "。"))
+        self.after(0, self.set_bulk_progress, "")
+        if on_done: self.after(0, on_done)
+
+    def bulk_restart(self):
+        targets = [(path, douyin_id) for path, douyin_id in self._filtered_targets() if douyin_id in self.running_processes]
+        if not targets: self.log(f"{self._filter_name()} 没有正在运行的主播可重启。", "WARN"); return
+        if not messagebox.askyesno("批量重启", f"确定要重启 {self._filter_name()} 的 {len(targets)} 个正在运行的主播吗？\n正在进行的推流会中断。"): return
+        self.log(f"开始批量重启 {self._filter_name()} 的 {len(targets)} 个主播。")
+        self.bulk_stop([douyin_id for _, douyin_id in targets], on_done=lambda: self._begin_ramp(targets))
+
     def update_status_ui(self, douyin_id, status):
         if douyin_id not in self.streamer_cards: return
         card = self.streamer_cards[douyin_id]
@@ -562,9 +969,33 @@ class ManagerApp(ctk.CTk):
             self.log(f"更新备注失败: {e}", "ERROR")
 
     def on_closing(self):
-        if self.running_processes and messagebox.askyesno("退出确认", f"还有 {len(self.running_processes)} 个直播正在运行，确定要全部停止并退出吗？"):
-            for douyin_id in list(self.running_processes.keys()): self.stop_streamer(douyin_id)
-            time.sleep(1) # Give processes a moment to terminate
+        if self.running_processes:
+            streaming = sum(1 for info in self.running_processes.values() if 'session_start' in info)
+            if checkpoint.SUPPORTED and streaming:
+                answer = messagebox.askyesnocancel("退出确认", f"还有 {len(self.running_processes)} 个直播正在运行，其中 {streaming} 个正在推流。\n\n是：全部停止并退出\n否：保留正在进行的推流并退出，下次启动主控台时自动接管\n取消：返回")
+                if answer is None: return
+                stop, detach = True, not answer
+            else:
+                stop, detach = messagebox.askyesno("退出确认", f"还有 {len(self.running_processes)} 个直播正在运行，确定要全部停止并退出吗？"), False
+            if stop:
+                # 在背景等待所有进程树结束 (最多 stop_timeout 秒) 再关闭视窗，避免退出后留下 FFmpeg / 浏览器，等待期间界面不冻结
+                stopping, self.running_processes = self.running_processes, {}
+                self.closing.set()  # 停止背景取样，并拒绝在等待期间启动新的直播
+                self.protocol("WM_DELETE_WINDOW", lambda: None)
+                self.log(f"正在停止 {len(stopping)} 个直播，完成后自动退出...")
+
+                def shutdown_and_close():
+                    killed = self._shutdown(stopping, detach=detach)
+                    if detach: self.log(f"已保留 {streaming} 个正在进行的推流，下次启动时将自动接管。")
+                    if killed: self.log(f"退出时有 {len(killed)} 个主播逾时被强制结束: {', '.join(killed)}", "WARN")
+                    self.after(0, self._close_window)
+                threading.Thread(target=shutdown_and_close, daemon=True).start()
+                return
+        self._close_window()
+
+    def _close_window(self):
+        self.closing.set()
+        self.log_writer.close()
         self.destroy()
 
     def edit_settings(self, profile_path):
@@ -599,9 +1030,13 @@ class ManagerApp(ctk.CTk):
             card = self.streamer_cards[douyin_id]
             card.start_button.configure(state="disabled" if is_running else "normal")
             card.stop_button.configure(state="normal" if is_running else "disabled")
-            card.settings_button.configure(state="disabled" if is_running else "normal")
+            # 运行中的工作进程会自动重新载入设定，设定与分组不必停止后才能修改
             card.delete_button.configure(state="disabled" if is_running else "normal")
-            card.group_menu.configure(state="disabled" if is_running else "normal")
+            if not is_running: card.notice_label.configure(text=""); card.resource_label.configure(text="")
+
+    def show_restart_notice(self, douyin_id, keys):
+        if douyin_id not in self.streamer_cards: return
+        self.streamer_cards[douyin_id].notice_label.configure(text=f"⚠️ 需重启生效: {keys}" if keys else "")
 
     def delete_streamer(self, douyin_id, profile_path):
         dialog = ctk.CTkInputDialog(text=f"您确定要永久删除主播 {douyin_id} 吗？\n这将会删除其整个设定档资料夹，此操作无法复原！\n\n请输入 '{douyin_id}' 来确认：", title="删除确认")
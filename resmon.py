@@ -0,0 +1,109 @@
+# resmon.py (v1.0 - 工作进程资源统计)
+"""
+按主播统计整棵工作进程树 (streamer.py、FFmpeg、Chromium) 的资源使用量。
+
+每次取样只扫描一次 /proc：CPU% (utime + stime 的增量)、RSS、打开的档案描述符数，
+以及 /proc/<pid>/io 的 rchar / wchar 增量作为读写吞吐 (包含网路收发，也包含档案读写)。
+每个主播保留最近若干次取样，供仪表板绘制迷你走势图与判断告警门槛。
+
+依赖 /proc (Linux)，其他平台不取样。
+"""
+import os
+import time
+from collections import deque
+
+import supervisor
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _read_counters(pid: int):
+    """返回 (cpu_ticks, rss_bytes, fds, rchar, wchar)；进程已消失时返回 None。"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read().decode('utf-8', errors='replace')
+        fields = data[data.rfind(')') + 2:].split()
+        cpu_ticks, rss = int(fields[11]) + int(fields[12]), int(fields[21]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+    try:
+        fds = len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        fds = 0
+    rchar = wchar = 0
+    try:
+        with open(f'/proc/{pid}/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'): rchar = int(line.split()[1])
+                elif line.startswith('wchar:'): wchar = int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return cpu_ticks, rss, fds, rchar, wchar
+
+
+def sparkline(values, width: int = 20) -> str:
+    values = list(values)[-width:]
+    if not values: return ""
+    low, high = min(values), max(values)
+    if high - low < 1e-9: return SPARK_CHARS[0] * len(values)
+    return "".join(SPARK_CHARS[int((v - low) / (high - low) * (len(SPARK_CHARS) - 1))] for v in values)
+
+
+class ResourceMonitor:
+    """非执行绪安全：sample / series / rss_growth 须在同一个执行绪中呼叫。"""
+    def __init__(self, history: int = 60):
+        self.history = history
+        self.samples = {}    # douyin_id -> deque[dict]
+        self._previous = {}  # pid -> (cpu_ticks, rchar, wchar, 取样时间)
+
+    def sample(self, targets: dict) -> dict:
+        """
+        targets 为 {douyin_id: {'pid', 'marker', 'extra'(可选 pid 集合)}}，
+        返回 {douyin_id: 本次取样}，同时加入各自的历史记录。
+        """
+        if not supervisor.HAS_PROC: return {}
+        now = time.time()
+        table = supervisor.scan_processes()
+        marked = supervisor.find_marked({t['marker'] for t in targets.values() if t.get('marker')})
+        previous, self._previous = self._previous, {}
+        results = {}
+        for douyin_id, target in targets.items():
+            pids = supervisor.process_tree(target['pid'], None, table) | (marked.get(target.get('marker'), set()) | set(target.get('extra', ()))) & table.keys()
+            cpu_seconds = rss = fds = read_bytes = write_bytes = 0
+            for pid in pids:
+                counters = _read_counters(pid)
+                if counters is None: continue
+                cpu_ticks, pid_rss, pid_fds, rchar, wchar = counters
+                rss += pid_rss; fds += pid_fds
+                self._previous[pid] = (cpu_ticks, rchar, wchar, now)
+                # 新出现的进程没有上一次的计数，本次不计入增量
+                if pid in previous:
+                    prev_ticks, prev_rchar, prev_wchar, prev_time = previous[pid]
+                    cpu_seconds += max(0, cpu_ticks - prev_ticks) / CLOCK_TICKS
+                    read_bytes += max(0, rchar - prev_rchar); write_bytes += max(0, wchar - prev_wchar)
+            elapsed = max(1e-3, now - min((previous[p][3] for p in pids if p in previous), default=now))
+            result = {
+                'time': now, 'procs': len(pids), 'cpu_percent': cpu_seconds / elapsed * 100, 'rss_mb': rss / 1024 / 1024, 'fds': fds,
+                'read_kbps': read_bytes * 8 / 1000 / elapsed, 'write_kbps': write_bytes * 8 / 1000 / elapsed,
+            }
+            self.samples.setdefault(douyin_id, deque(maxlen=self.history)).append(result)
+            results[douyin_id] = result
+        for douyin_id in list(self.samples):
+            if douyin_id not in targets: del self.samples[douyin_id]
+        return results
+
+    def series(self, douyin_id: str, key: str) -> list:
+        return [s[key] for s in self.samples.get(douyin_id, ())]
+
+    def rss_growth(self, douyin_id: str) -> float | None:
+        """
+        历史记录已满时，返回窗口内最近三分之一取样的 RSS 最低值相对于最早三分之一最低值的增长 (MB)。
+        取最低值可滤掉检测时临时启动浏览器造成的尖峰，只反映持续上升的趋势 (疑似泄漏)。
+        """
+        history = self.samples.get(douyin_id)
+        if not history or len(history) < self.history or len(history) < 3: return None
+        third = len(history) // 3
+        rss = [s['rss_mb'] for s in history]
+        return min(rss[-third:]) - min(rss[:third])
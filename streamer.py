@@ -1,18 +1,23 @@
 # streamer.py (v1.2 - 健壮路径版)
+import signal
 import subprocess
 import time
 import json
 import os
 import sys
 import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from configobj import ConfigObj
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from datetime import datetime, UTC
 
 # ---【路径修正：第一部分】---
 # 获取 streamer.py 自身的绝对目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
+MANAGER_CONFIG_PATH = os.path.join(script_dir, 'manager.ini')
 # ---【修正结束】---
 
 # --- 【核心修正】 ---
@@ -23,35 +28,151 @@ if sys.stdout.encoding != 'utf-8':
 
 # 从同级目录导入抓流模组
 import douyin
+import checkpoint
+import supervisor
+from proxypool import ProxyPool, parse_allowed
+from detect_cache import DetectionCache, BandwidthLedger
+
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+
+
+def read_setting(config, section: str, key: str, default, cast=float):
+    """读取数值或开关设定；缺少、留空 (旧设定档经设定视窗储存后可能是空字串) 或格式错误时使用预设值。"""
+    value = str(config.get(section, {}).get(key, '')).strip()
+    if not value: return default
+    if cast is bool: return value.lower() == 'true'
+    try:
+        return cast(value)
+    except ValueError:
+        return default
+
+# 设定热重载：其余项目在主循环中都是即时读取 self.config，替换后下一次使用时即生效
+RESTART_KEYS = {("Douyin", "douyin_id"), ("YouTube", "token_file"), ("FFmpeg", "reattach")}             # 需重启工作进程
+NEXT_PUSH_KEYS = {("FFmpeg", "ffmpeg_path"), ("FFmpeg", "bitrate"), ("Douyin", "stream_quality"), ("Douyin", "max_bitrate_kbps")}  # 推流中修改时下次推流生效
+BROADCAST_KEYS = {("YouTube", "broadcast_title"), ("YouTube", "broadcast_description"), ("YouTube", "privacy_status")}  # 推流中以 liveBroadcasts.update 套用
+
+API_TIMEOUT = 30               # 单次 YouTube API 请求的逾时 (秒)
+BROADCAST_SETUP_TIMEOUT = 120  # 开播时等待直播间创建/绑定的上限 (秒)，逾时则停止 FFmpeg
+
+
+class AdoptedProcess:
+    """接管的 FFmpeg (不是本进程的子进程)，提供与 Popen 相同的 poll/terminate/kill/wait。"""
+    def __init__(self, pid: int, start_time):
+        self.pid = pid
+        self.start_time = start_time
+        self.returncode = None
+
+    def poll(self):
+        # 非子进程取不到真实的返回码，结束后一律记为 -1
+        if self.returncode is None and not supervisor.process_alive(self.pid, self.start_time): self.returncode = -1
+        return self.returncode
+
+    def _send(self, sig):
+        if self.poll() is not None: return
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self): self._send(signal.SIGTERM)
+    def kill(self): self._send(signal.SIGKILL)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.time() > deadline: raise subprocess.TimeoutExpired("ffmpeg", timeout)
+            time.sleep(0.1)
+        return self.returncode
+
 
 class Streamer:
-    def __init__(self, profile_path: str):
+    def __init__(self, profile_path: str, initial_delay: float = 0):
         self.profile_path = profile_path
+        self.initial_delay = initial_delay
         self.config_filepath = os.path.join(profile_path, 'config.ini')
         self.stream_info_path = os.path.join(profile_path, 'stream_info.json')
+        self.log_level = LOG_LEVELS["DEBUG"]
         
         try:
+            self.config_mtime = os.path.getmtime(self.config_filepath)
             self.config = ConfigObj(self.config_filepath, encoding='UTF8')
         except Exception as e:
             self.log_message('ERROR', f"无法加载设定档 {self.config_filepath}: {e}")
             sys.exit(1)
+        self.log_level = LOG_LEVELS.get(str(self.config.get('Logging', {}).get('log_level', 'DEBUG')).upper(), LOG_LEVELS["DEBUG"])
+        self.disk_config = self.config.dict()  # 最近一次从磁碟读到的设定 (需重启的项目在 self.config 中维持原值)
+        self.restart_pending = []
 
         self.ffmpeg_process = None
+        self.youtube = None
         self.is_running = True
+        self.detach = False
+        self.detachable = os.environ.get(supervisor.DETACHABLE_ENV) == "1"
+        self.parent_pid = os.getppid()
         self.current_broadcast_id = None
+        self.session_start = None
+        self.reattach = checkpoint.SUPPORTED and read_setting(self.config, 'FFmpeg', 'reattach', True, bool)
+        self.executor = ThreadPoolExecutor(max_workers=1)
         self.douyin_id = self.config.get('Douyin', {}).get('douyin_id', os.path.basename(profile_path))
+        try:
+            self.detect_cache = DetectionCache(ttl=read_setting(self.config, 'Douyin', 'cache_ttl', 15.0))
+        except Exception as e:
+            self.log_message('WARN', f"无法开启共享检测快取，将直接抓取: {e}")
+            self.detect_cache = None
+        try:
+            self.bandwidth = BandwidthLedger()
+        except Exception as e:
+            self.log_message('WARN', f"无法开启本机码率帐本，将忽略节点带宽预算: {e}")
+            self.bandwidth = None
+        self.allowed_proxies = parse_allowed(self.config.get('Proxy', {}).get('proxy_pool'))
+        self.proxy_pool = None
+        if self.allowed_proxies is not None:
+            try:
+                self.proxy_pool = ProxyPool()
+            except Exception as e:
+                self.log_message('WARN', f"无法开启代理池，将改用 proxy_url: {e}")
+        self.browsers = douyin.BrowserPool(keepalive=read_setting(self.config, 'Douyin', 'browser_keepalive', 0.0))
+
+    def _emit(self, line: str):
+        try:
+            sys.stdout.write(line + "\n")  # 单次写入，避免多个执行绪的输出交错
+            sys.stdout.flush()
+        except (BrokenPipeError, ValueError):
+            # 启动者已不在 (崩溃或被强制关闭)：退出主循环；由主控台启动时保留正在推流的 FFmpeg 等待重启后接管
+            if self.is_running: self.detach = self.detachable
+            self.is_running = False
+            sys.stdout = open(os.devnull, 'w')
+
+    def _check_parent(self):
+        # 启动者消失后输出管道要到下次写入才会报错，这里每秒检查一次父进程是否已变
+        if sys.platform == 'win32' or os.getppid() == self.parent_pid: return
+        if self.is_running: self.detach = self.detachable
+        self.is_running = False
 
     def log_message(self, level: str, message: str):
-        print(f"LOG:{level.upper()}:{message}")
-        sys.stdout.flush()
+        if LOG_LEVELS.get(level.upper(), LOG_LEVELS["INFO"]) < self.log_level: return
+        self._emit(f"LOG:{level.upper()}:{message}")
 
     def set_status(self, status: str):
-        print(f"STATUS:{status}")
-        sys.stdout.flush()
+        self._emit(f"STATUS:{status}")
         
     def send_title(self, title: str):
-        print(f"TITLE:{title}")
-        sys.stdout.flush()
+        self._emit(f"TITLE:{title}")
+
+    def send_session(self, session_start):
+        # 推流会话的真实开始时间 (接管时沿用原来的)，主控台据此显示时长；空值表示会话结束
+        self._emit(f"SESSION:{session_start:.0f}" if session_start else "SESSION:")
+
+    def _handle_sigterm(self, signum, frame):
+        # 主控台以 SIGTERM 停止整个进程组：退出主循环并走 finally 中的 cleanup
+        if not self.is_running: return
+        self.is_running = False
+        raise SystemExit(0)
+
+    def _handle_detach(self, signum, frame):
+        # 主控台以「保留推流并退出」关闭时发送 SIGUSR1：工作进程退出，FFmpeg 继续推流
+        if self.is_running: self.detach = True
+        self._handle_sigterm(signum, frame)
 
     def run(self):
         try:
@@ -67,17 +188,24 @@ class Streamer:
             self.cleanup()
 
     def _main_loop(self):
-        youtube = self._get_authenticated_service()
+        youtube = self.youtube = self._get_authenticated_service()
         if not youtube:
             raise Exception("无法获取 YouTube 认证服务。")
 
         stream_id, youtube_key = self._get_or_create_stream_and_key(youtube, self.douyin_id)
         
         self.log_message("INFO", "启动抖音 → YouTube 自动转播系统")
-        pushing = False
-        check_interval = int(self.config.get('Douyin', {}).get('check_interval', 60))
+        pushing = self._try_adopt(youtube)
+
+        if self.initial_delay > 0 and not pushing:
+            # 批量启动时由主控台指定，把各主播的首次检查错开，避免同时打开大量浏览器
+            self.log_message("INFO", f"⏱️ 为错开批量启动，首次检查将延后 {self.initial_delay:.0f} 秒。")
+            deadline = time.time() + self.initial_delay
+            while self.is_running and time.time() < deadline: time.sleep(1)
         
         while self.is_running:
+            self._reload_config()
+            check_interval = int(self.config.get('Douyin', {}).get('check_interval', 60))
             if not pushing:
                 self.set_status("checking")
                 self.log_message("INFO", "主播未开播或推流中断，进入检查模式...")
@@ -87,24 +215,38 @@ class Streamer:
                 wait_time = int(self.config.get('Douyin', {}).get('wait_time', 30))
                 proxy_config = {"server": proxy_url} if proxy_url else {}
 
-                flv_url, title = douyin.get_stream_info(self.douyin_id, chrome_path, proxy_config, wait_time)
+                self._release_bandwidth()
+                room = self._detect_stream(chrome_path, proxy_config, wait_time)
+                if room.is_live and room.title: self.send_title(room.title)
+                quality = self._reserve_quality(room) if room.is_live else None
 
-                if flv_url:
-                    if title: self.send_title(title)
+                if quality:
+                    flv_url = quality.url
                     self.log_message("INFO", "🎯 检测到主播开播，准备推流...")
+                    detected_at = time.time()
                     try:
-                        self.current_broadcast_id = self._create_live_broadcast(youtube)
-                        self._bind_stream(youtube, self.current_broadcast_id, stream_id)
-                        self.ffmpeg_process = self._start_ffmpeg_stream(flv_url, youtube_key)
-                        if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
+                        # 固定推流码可重复使用：先启动 FFmpeg，同时在背景创建并绑定直播间
+                        setup = {}
+                        setup_future = self.executor.submit(self._create_and_bind, youtube, stream_id, setup)
+                        self.ffmpeg_process = self._start_ffmpeg_stream(flv_url, youtube_key, detected_at)
+                        self.current_broadcast_id = self._wait_broadcast_setup(setup_future, youtube, stream_id, setup)
+                        if self.current_broadcast_id is None:
+                            self.log_message("ERROR", "❌ 无法创建或绑定直播间，停止本次推流，将在下一轮检测时重试。")
+                            self._stop_ffmpeg()
+                            self.set_status("error")
+                        elif self.ffmpeg_process and self.ffmpeg_process.poll() is None:
                             self.set_status("streaming"); pushing = True
                             self.log_message("INFO", "✅ 推流进程已启动，进入巡航模式。")
+                            self._begin_session(stream_id, quality)
                         else:
                             self.log_message("ERROR", "❌ 推流启动失败，将在下一轮检测时重试。")
                             self.set_status("error")
                     except Exception as e:
                         self.log_message("ERROR", f"❌ 创建或推流时发生异常：{e}")
                         self.set_status("error")
+                elif room.is_live:
+                    self.set_status("checking")
+                    self.log_message("WARN", f"⚠️ 主播已开播，但没有符合码率上限或本机带宽预算的画质，将在 {check_interval} 秒后重试。")
                 else:
                     self.set_status("offline")
                     self.log_message("INFO", f"🌙 主播未开播，将在 {check_interval} 秒后再次检查。")
@@ -115,25 +257,301 @@ class Streamer:
                 else:
                     self.log_message("WARN", "⚠️ 检测到推流进程已停止！返回检查模式。")
                     self.set_status("checking")
+                    self._end_session()
                     pushing = False
             
-            for _ in range(check_interval):
-                if not self.is_running: break
-                time.sleep(1)
+            # 等待期间每秒检查一次设定档，修改后的检测间隔立即生效
+            waited = 0
+            while self.is_running and waited < int(self.config.get('Douyin', {}).get('check_interval', 60)):
+                time.sleep(1); waited += 1
+                self._check_parent()
+                self._reload_config()
+                self._release_idle_browsers()
 
     def cleanup(self):
         self.is_running = False
-        if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
-            self.log_message("INFO", "🔪 正在停止残留的推流进程...")
-            self.ffmpeg_process.terminate()
-            try:
-                self.ffmpeg_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.log_message("WARN", "FFmpeg 进程在5秒内未终止，强制结束。")
-                self.ffmpeg_process.kill()
+        ffmpeg_running = self.ffmpeg_process and self.ffmpeg_process.poll() is None
+        if self.detach and self.reattach and self.session_start and ffmpeg_running:
+            self.log_message("INFO", f"🔗 FFmpeg (PID: {self.ffmpeg_process.pid}) 将继续推流，检查点已保留，重启后会自动接管。")
+        else:
+            if ffmpeg_running:
+                self.log_message("INFO", "🔪 正在停止残留的推流进程...")
+                self._stop_ffmpeg()
+            if self.session_start: self._end_session()
+        self._release_bandwidth()
+        try:
+            self.browsers.close()
+        except Exception:
+            pass
+        self.executor.shutdown(wait=False)
         self.log_message("INFO", "⛔️ 转播任务已停止。")
         self.set_status("stopped")
         
+    def _stop_ffmpeg(self):
+        if not self.ffmpeg_process or self.ffmpeg_process.poll() is not None: return
+        self.ffmpeg_process.terminate()
+        try:
+            self.ffmpeg_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.log_message("WARN", "FFmpeg 进程在5秒内未终止，强制结束。")
+            self.ffmpeg_process.kill()
+
+    # ---------------- 设定热重载 ----------------
+    def _reload_config(self):
+        """config.ini 被修改时重新载入，能即时生效的设定直接套用，需要重启的设定明确回报。"""
+        try:
+            mtime = os.path.getmtime(self.config_filepath)
+        except OSError:
+            return
+        # 修改时间太近时等下一次再读，避免读到主控台写了一半的档案
+        if mtime == self.config_mtime or time.time() - mtime < 0.5: return
+        self.config_mtime = mtime
+        try:
+            new_config = ConfigObj(self.config_filepath, encoding='UTF8')
+        except Exception as e:
+            self.log_message("WARN", f"重新载入设定档失败，继续使用原来的设定: {e}")
+            return
+        # 与上次读到的档案内容比较 (备注、分组不影响转播)，而不是与维持了原值的 self.config 比较，
+        # 否则每次修改其他项目都会重复回报需要重启的项目；被删除的项目也算修改，之后按预设值处理
+        new_disk = new_config.dict()
+        changed = {(section, key) for config in (new_disk, self.disk_config) for section, options in config.items()
+                   if section != 'Custom' and isinstance(options, dict) for key in options
+                   if self.disk_config.get(section, {}).get(key) != new_disk.get(section, {}).get(key)}
+        old_config, self.config, self.disk_config = self.config, new_config, new_disk
+        if not changed: return
+        try:
+            self._apply_config(changed, old_config)
+        except Exception as e:
+            self.log_message("ERROR", f"套用新设定时发生错误，部分设定可能未生效: {e}")
+
+    def _apply_config(self, changed, old_config):
+        next_push = sorted(f"{s}.{k}" for s, k in changed & NEXT_PUSH_KEYS) if self.session_start else []
+        applied = sorted(f"{s}.{k}" for s, k in changed - RESTART_KEYS - (NEXT_PUSH_KEYS if self.session_start else set()) - BROADCAST_KEYS)
+
+        # 需要重启的设定维持原值，以免工作进程处于新旧设定混杂的状态
+        for section, key in RESTART_KEYS:
+            if key in old_config.get(section, {}):
+                if section not in self.config: self.config[section] = {}
+                self.config[section][key] = old_config[section][key]
+            elif key in self.config.get(section, {}): del self.config[section][key]
+        # 档案中与运行中不同 (含被删除) 的需重启项目；改回原值时回报空清单，主控台据此清除提示
+        restart = sorted(f"{s}.{k}" for s, k in RESTART_KEYS if self.disk_config.get(s, {}).get(k) != self.config.get(s, {}).get(k))
+
+        self.log_level = LOG_LEVELS.get(str(self.config.get('Logging', {}).get('log_level', 'DEBUG')).upper(), LOG_LEVELS["DEBUG"])
+        if self.detect_cache is not None: self.detect_cache.ttl = read_setting(self.config, 'Douyin', 'cache_ttl', 15.0)
+        self.browsers.keepalive = read_setting(self.config, 'Douyin', 'browser_keepalive', 0.0)
+        self.allowed_proxies = parse_allowed(self.config.get('Proxy', {}).get('proxy_pool'))
+        if self.allowed_proxies is None: self.proxy_pool = None  # 清空 proxy_pool 即停用代理池，改回 proxy_url
+        elif self.proxy_pool is None:
+            try:
+                self.proxy_pool = ProxyPool()
+            except Exception as e:
+                self.log_message("WARN", f"无法开启代理池，将改用 proxy_url: {e}")
+
+        broadcast = sorted(f"{s}.{k}" for s, k in changed & BROADCAST_KEYS)
+        if broadcast and self.session_start and self.current_broadcast_id:
+            try:
+                self._update_broadcast()
+                self.log_message("INFO", f"📝 已更新正在进行的直播间 {self.current_broadcast_id}: {', '.join(broadcast)}")
+            except Exception as e:
+                self.log_message("WARN", f"⚠️ 更新直播间资讯失败，将在下次直播时生效: {e}")
+        else:
+            applied = sorted(applied + broadcast)
+
+        if applied: self.log_message("INFO", f"🔄 已套用新设定: {', '.join(applied)}")
+        if next_push: self.log_message("WARN", f"⚠️ 以下设定需要重新启动 FFmpeg，将在下次推流时生效 (当前推流不中断): {', '.join(next_push)}")
+        if restart != self.restart_pending:
+            if restart: self.log_message("WARN", f"⚠️ 以下设定需要重启此主播才能生效: {', '.join(restart)}")
+            self._emit(f"RESTART_REQUIRED:{','.join(restart)}")
+            self.restart_pending = restart
+
+    def _update_broadcast(self):
+        """把标题、说明与隐私状态套用到正在进行的直播间，不中断推流。"""
+        yt_config = self.config.get('YouTube', {})
+        items = self.youtube.liveBroadcasts().list(part="snippet,status", id=self.current_broadcast_id).execute().get('items', [])
+        if not items: raise Exception(f"找不到直播间 {self.current_broadcast_id}")
+        snippet = items[0]['snippet']
+        body = {
+            "id": self.current_broadcast_id,
+            "snippet": {"title": yt_config.get('broadcast_title', f'转播 - {self.douyin_id}'), "description": yt_config.get('broadcast_description', ''), "scheduledStartTime": snippet.get('scheduledStartTime')},
+            "status": {"privacyStatus": yt_config.get('privacy_status', 'private'), "selfDeclaredMadeForKids": False},
+        }
+        self.youtube.liveBroadcasts().update(part="snippet,status", body=body).execute()
+
+    # ---------------- 推流会话检查点 / 接管 ----------------
+    def _begin_session(self, stream_id, quality):
+        self.session_start = time.time()
+        self.send_session(self.session_start)
+        if not self.reattach: return
+        pid = self.ffmpeg_process.pid
+        state = {
+            'douyin_id': self.douyin_id, 'broadcast_id': self.current_broadcast_id, 'stream_id': stream_id,
+            'source_url': quality.url, 'quality': quality.name,
+            'kbps': quality.bitrate_kbps or douyin.parse_bitrate_kbps(self.config.get('FFmpeg', {}).get('bitrate', '4000k')),
+            'ffmpeg_pid': pid, 'ffmpeg_start_time': supervisor.process_start_time(pid),
+            'session_start': self.session_start, 'worker_pid': os.getpid(),
+        }
+        try:
+            checkpoint.save(self.profile_path, state)
+        except OSError as e:
+            self.log_message("WARN", f"无法写入推流检查点，重启后将无法接管本次推流: {e}")
+
+    def _end_session(self):
+        self.session_start = None
+        self.send_session(None)
+        checkpoint.clear(self.profile_path)
+
+    def _try_adopt(self, youtube):
+        """读取上次的推流检查点；FFmpeg 仍在推流且直播间未结束时直接接管，返回是否已接管。"""
+        state = checkpoint.load(self.profile_path)
+        if not state: return False
+        process = AdoptedProcess(state['ffmpeg_pid'], state.get('ffmpeg_start_time')) if checkpoint.ffmpeg_alive(state) else None
+        start_timeout = read_setting(self.config, 'FFmpeg', 'start_timeout', 20, int)
+        if process is None:
+            reason = "FFmpeg 已不在运行"
+        elif not self.reattach:
+            reason = "已关闭接管功能 ([FFmpeg] reattach)"
+        elif (silence := checkpoint.seconds_since_progress(self.profile_path)) > start_timeout:
+            reason = f"FFmpeg 已 {silence:.0f} 秒没有推流进度"
+        else:
+            reason = self._check_broadcast(youtube, state.get('broadcast_id'))
+        if reason:
+            self.log_message("INFO", f"发现上次的推流检查点，但{reason}，不予接管。")
+            if process:
+                self.ffmpeg_process = process; self._stop_ffmpeg(); self.ffmpeg_process = None
+            checkpoint.clear(self.profile_path)
+            return False
+
+        self.ffmpeg_process = process
+        self.current_broadcast_id = state.get('broadcast_id')
+        if self.bandwidth:
+            try:
+                self.bandwidth.reserve_within(self.douyin_id, 0, lambda _: (True, int(state.get('kbps') or 0)))
+            except Exception:
+                pass
+        threading.Thread(target=self._follow_ffmpeg_log, args=(process, checkpoint.ffmpeg_log_path(self.profile_path)), kwargs={'from_end': True}, daemon=True).start()
+        self.session_start = state.get('session_start') or time.time()
+        elapsed = int(time.time() - self.session_start)
+        self.set_status("streaming")
+        self.log_message("INFO", f"🔗 已接管仍在推流的 FFmpeg (PID: {process.pid})，直播间 {self.current_broadcast_id} 不中断，会话已持续 {elapsed // 3600:02}:{elapsed % 3600 // 60:02}:{elapsed % 60:02}。")
+        self.send_session(self.session_start)
+        try:
+            checkpoint.save(self.profile_path, dict(state, worker_pid=os.getpid()))
+        except OSError:
+            pass
+        return True
+
+    def _check_broadcast(self, youtube, broadcast_id):
+        """返回不能接管的原因；查询失败时不阻止接管，以免无谓地中断推流。"""
+        if not broadcast_id: return "检查点中没有直播间ID"
+        try:
+            items = youtube.liveBroadcasts().list(part="status", id=broadcast_id).execute().get('items', [])
+        except Exception as e:
+            self.log_message("WARN", f"无法查询直播间 {broadcast_id} 的状态，仍尝试接管: {e}")
+            return None
+        if not items: return f"直播间 {broadcast_id} 已不存在"
+        status = items[0].get('status', {}).get('lifeCycleStatus')
+        if status in ('complete', 'revoked'): return f"直播间 {broadcast_id} 已结束 ({status})"
+        return None
+
+    def _detect_stream(self, chrome_path, proxy_config, wait_time):
+        def fetch():
+            room = self._scrape(chrome_path, proxy_config, wait_time)
+            return room.to_dict() if room else None  # 抓取失败不写入共享快取，以免其他进程把开播中的主播当成未开播
+
+        if self.detect_cache is None:
+            result = fetch()
+        else:
+            try:
+                result, source = self.detect_cache.get_or_fetch(self.douyin_id, fetch)
+            except Exception as e:
+                self.log_message("WARN", f"共享检测快取出错，改为直接抓取: {e}")
+                result, source = fetch(), "scrape"
+            if source == "hit":
+                self.log_message("INFO", f"♻️ 使用 {self.detect_cache.ttl:g} 秒内的共享检测结果，跳过本次抓取。")
+            elif source == "coalesced":
+                self.log_message("INFO", "🤝 其他进程正在抓取同一主播，已直接使用其结果。")
+            try:
+                stats = self.detect_cache.stats()
+                if stats['hit_rate'] is not None:
+                    self.log_message("DEBUG", f"检测快取: 请求 {stats['requests']} 次，实际抓取 {stats['scrapes']} 次，合併 {stats['coalesced']} 次，复用率 {stats['hit_rate'] * 100:.1f}%")
+            except Exception:
+                pass
+        self.browsers.release_idle()
+        return douyin.RoomInfo.from_dict(result) if result else douyin.RoomInfo()
+
+    def _release_idle_browsers(self):
+        # 推流期间不会再抓取，在等待循环中按 browser_keepalive 关闭闲置的浏览器
+        try:
+            self.browsers.release_idle()
+        except Exception as e:
+            self.log_message("WARN", f"关闭闲置浏览器时出错: {e}")
+
+    def _scrape(self, chrome_path, proxy_config, wait_time):
+        """设定了 [Proxy] proxy_pool 时按评分选择代理，失败或被拦截时换下一个代理重试一次；否则使用固定的 proxy_url。"""
+        if self.proxy_pool is None or self.allowed_proxies is None:
+            return douyin.scrape_room(self.douyin_id, chrome_path, proxy_config, wait_time, self.browsers, log=self.log_message).room
+        goto_timeout = read_setting(self.config, 'Proxy', 'proxy_timeout', 20.0)
+        tried = []
+        while len(tried) < 2:
+            proxy = self.proxy_pool.choose(self.allowed_proxies, exclude=tried)
+            if proxy is None: break
+            tried.append(proxy.name)
+            result = douyin.scrape_room(self.douyin_id, chrome_path, proxy.playwright_config(), wait_time, self.browsers, goto_timeout, log=self.log_message)
+            # 失败时以整次耗时计入延迟，让超时的代理评分下降
+            latency = result.goto_seconds if result.outcome == "ok" else result.total_seconds
+            try:
+                self.proxy_pool.record(proxy.name, result.outcome, latency, result.goto_seconds, result.total_seconds, result.error)
+            except Exception as e:
+                self.log_message("WARN", f"无法记录代理 {proxy.name} 的评分: {e}")
+            if result.outcome == "ok":
+                self.log_message("DEBUG", f"代理 {proxy.name}: 导航 {result.goto_seconds:.1f} 秒，抓取共 {result.total_seconds:.1f} 秒。")
+                return result.room
+            self.log_message("WARN", f"⚠️ 代理 {proxy.name} 抓取{'被拦截' if result.outcome == 'blocked' else '失败'} ({result.error})，已进入冷却。")
+        if not tried:
+            self.log_message("WARN", "代理池中没有可用的代理，改用 proxy_url。")
+            return douyin.scrape_room(self.douyin_id, chrome_path, proxy_config, wait_time, self.browsers, log=self.log_message).room
+        return None
+
+    def _reserve_quality(self, room):
+        """按 [Douyin] stream_quality / max_bitrate_kbps 与本机 manager.ini 的 [Bandwidth] node_bandwidth_kbps 选择画质并登记占用的码率。"""
+        douyin_config = self.config.get('Douyin', {})
+        preferred = douyin_config.get('stream_quality', 'origin') or 'origin'
+        profile_cap = int(douyin_config.get('max_bitrate_kbps', 0) or 0)
+        node_budget = self._node_budget_kbps()
+        fallback_kbps = douyin.parse_bitrate_kbps(self.config.get('FFmpeg', {}).get('bitrate', '4000k'))
+
+        def pick(remaining_kbps):
+            caps = [cap for cap in (profile_cap, remaining_kbps) if cap]
+            # 码率未知的画质按 [FFmpeg] bitrate 估计，与登记的占用量一致
+            quality = douyin.select_quality(room, preferred, min(caps) if caps else 0, fallback_kbps)
+            return quality, (quality.bitrate_kbps or fallback_kbps) if quality else 0
+
+        try:
+            quality = self.bandwidth.reserve_within(self.douyin_id, node_budget, pick) if self.bandwidth else pick(0)[0]
+        except Exception as e:
+            self.log_message("WARN", f"本机码率帐本出错，忽略带宽预算: {e}")
+            quality = pick(0)[0]
+        if quality:
+            bitrate = f"{quality.bitrate_kbps} kbps" if quality.bitrate_kbps else "码率未知"
+            self.log_message("INFO", f"📺 选用画质 {quality.name} ({bitrate}{f', {quality.resolution}' if quality.resolution else ''})。")
+        return quality
+
+    def _node_budget_kbps(self) -> int:
+        # 带宽预算是整台主机共用的，放在 manager.ini 而不是各主播的 config.ini，避免各设定档不一致
+        try:
+            return int(ConfigObj(MANAGER_CONFIG_PATH, encoding='UTF8').get('Bandwidth', {}).get('node_bandwidth_kbps', 0) or 0)
+        except Exception as e:
+            self.log_message("WARN", f"无法读取 manager.ini 中的带宽预算，视为不限: {e}")
+            return 0
+
+    def _release_bandwidth(self):
+        if not self.bandwidth: return
+        try:
+            self.bandwidth.release(self.douyin_id)
+        except Exception:
+            pass
+
     def _preflight_check(self):
         self.log_message("INFO", "🩺 正在执行启动前环境检测...")
         ffmpeg_path = self.config.get('FFmpeg', {}).get('ffmpeg_path', 'ffmpeg')
@@ -163,7 +581,8 @@ class Streamer:
             return None
         try:
             creds = Credentials.from_authorized_user_file(token_path, scopes)
-            return build("youtube", "v3", credentials=creds)
+            # 设定请求逾时，卡住的 API 请求不会无限期占用背景执行绪
+            return build("youtube", "v3", http=AuthorizedHttp(creds, http=httplib2.Http(timeout=API_TIMEOUT)))
         except Exception as e:
             self.log_message("ERROR", f"❌ YouTube API 认证失败: {e}")
             return None
@@ -206,42 +625,131 @@ class Streamer:
         self.log_message("INFO", f"正在绑定直播间 (ID: {broadcast_id}) 与推流码 (ID: {stream_id})")
         youtube.liveBroadcasts().bind(part="id,contentDetails", id=broadcast_id, streamId=stream_id).execute()
         self.log_message("INFO", f"🔗 已成功绑定直播间与推流码。")
+
+    def _create_and_bind(self, youtube, stream_id, setup):
+        # 已创建的直播间ID记在 setup 中，绑定失败时重试只需重新绑定，不会再创建一个直播间
+        if not setup.get('broadcast_id'): setup['broadcast_id'] = self._create_live_broadcast(youtube)
+        self._bind_stream(youtube, setup['broadcast_id'], stream_id)
+        return setup['broadcast_id']
+
+    def _wait_broadcast_setup(self, future, youtube, stream_id, setup):
+        """
+        等待背景的直播间创建/绑定结果；背景请求出错时在前台重试一次，推流不中断。
+        请求逾时仍在进行时继续等待同一个请求，不另外发出创建请求，避免同一推流码绑定两个直播间；
+        总共等待超过 BROADCAST_SETUP_TIMEOUT 秒则放弃 (由呼叫者停止 FFmpeg)。
+        """
+        waited = 0
+        while True:
+            try:
+                return future.result(timeout=10)
+            except FutureTimeoutError:
+                waited += 10
+                if not self.is_running or waited >= BROADCAST_SETUP_TIMEOUT:
+                    if self.is_running: self.log_message("ERROR", f"❌ 直播间创建/绑定超过 {BROADCAST_SETUP_TIMEOUT} 秒仍未完成，放弃本次推流。")
+                    else: self.log_message("WARN", "⚠️ 程序正在停止，放弃等待直播间创建/绑定。")
+                    future.add_done_callback(lambda f: self._discard_late_broadcast(youtube, f))
+                    return None
+                if waited % 60 == 0: self.log_message("WARN", f"⚠️ 直播间创建/绑定已等待 {waited} 秒，继续等待...")
+            except Exception as e:
+                self.log_message("WARN", f"⚠️ 背景创建/绑定直播间失败: {e}，正在重试...")
+                break
+        try:
+            return self._create_and_bind(youtube, stream_id, setup)
+        except Exception as e:
+            self.log_message("ERROR", f"❌ 重试创建/绑定直播间仍然失败: {e}")
+            return None
         
-    def _start_ffmpeg_stream(self, flv_url, youtube_key):
+    def _discard_late_broadcast(self, youtube, future):
+        # 已放弃等待的请求之后才完成：删除这个没人使用的直播间，以免它留在推流码上
+        if future.cancelled() or future.exception() is not None: return
+        try:
+            youtube.liveBroadcasts().delete(id=future.result()).execute()
+            self.log_message("INFO", f"🗑️ 已删除逾时后才创建完成的直播间 {future.result()}。")
+        except Exception as e:
+            self.log_message("WARN", f"无法删除逾时后才创建完成的直播间 {future.result()}: {e}")
+
+    def _start_ffmpeg_stream(self, flv_url, youtube_key, detected_at=None):
         rtmp_url = f"rtmp://a.rtmp.youtube.com/live2/{youtube_key}"
         ffmpeg_config = self.config.get('FFmpeg', {}); ffmpeg_path = ffmpeg_config.get('ffmpeg_path', 'ffmpeg'); bitrate = ffmpeg_config.get('bitrate', '4000k')
+        start_timeout = read_setting(self.config, 'FFmpeg', 'start_timeout', 20, int)
         user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
         headers = f"Referer: https://live.douyin.com/\r\nUser-Agent: {user_agent}\r\n"
         cmd = [ffmpeg_path, "-re", "-headers", headers, "-i", flv_url, "-c:v", "copy", "-c:a", "aac", "-ar", "44100", "-b:v", bitrate, "-f", "flv", rtmp_url]
         self.log_message("INFO", f"🚀 正在启动 FFmpeg 推流... (模式: 直接複製视讯流)")
         try:
-            creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='ignore', creationflags=creationflags)
-            threading.Thread(target=self._log_ffmpeg_output, args=(process,), daemon=True).start()
-            time.sleep(5)
-            if process.poll() is None:
-                self.log_message("INFO", f"✅ FFmpeg 进程已成功启动 (PID: {process.pid})。")
+            first_progress = threading.Event()
+            if self.reattach:
+                # 独立进程组，输出写到档案而不是管道：工作进程退出后 FFmpeg 仍能继续推流，等待重启后接管
+                log_path = checkpoint.ffmpeg_log_path(self.profile_path)
+                open(log_path, 'wb').close()
+                with open(log_path, 'ab') as log_file:  # 追加模式，追踪时才能安全地截断
+                    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+                threading.Thread(target=self._follow_ffmpeg_log, args=(process, log_path, first_progress), daemon=True).start()
+            else:
+                creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='ignore', creationflags=creationflags)
+                threading.Thread(target=self._log_ffmpeg_output, args=(process, first_progress), daemon=True).start()
+            # 以 FFmpeg 的首个进度输出 (frame=/size=) 作为推流成功的确认，而不是固定等待
+            deadline = time.time() + start_timeout
+            while not first_progress.wait(0.2):
+                if process.poll() is not None or time.time() > deadline: break
+            if first_progress.is_set():
+                elapsed = f"，距检测到开播 {time.time() - detected_at:.1f} 秒" if detected_at else ""
+                self.log_message("INFO", f"✅ FFmpeg 已开始输出数据 (PID: {process.pid}){elapsed}。")
                 return process
+            if process.poll() is None:
+                self.log_message("ERROR", f"❌ FFmpeg 在 {start_timeout} 秒内没有任何推流进度，放弃本次推流。")
+                process.kill()
             else:
                 self.log_message("ERROR", f"❌ FFmpeg 启动后立即退出，返回码: {process.poll()}")
-                return None
+            return None
         except Exception as e:
             self.log_message("ERROR", f"❌ 执行 FFmpeg 时发生严重错误: {e}")
             return None
 
-    def _log_ffmpeg_output(self, process):
+    def _log_ffmpeg_output(self, process, first_progress=None):
         if process.stdout:
             for line in iter(process.stdout.readline, ''):
-                if line: self.log_message("DEBUG", f"[FFmpeg] {line.strip()}")
+                if not line: continue
+                self._handle_ffmpeg_line(line, first_progress)
             process.stdout.close()
 
+    def _follow_ffmpeg_log(self, process, log_path, first_progress=None, from_end=False):
+        # 追踪 ffmpeg.log；档案过大时截断 (FFmpeg 以追加方式写入，截断后从头继续写)
+        pending = ""
+        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+            if from_end: f.seek(0, os.SEEK_END)
+            while True:
+                chunk = f.readline()
+                if chunk:
+                    pending += chunk
+                    if pending.endswith("\n"):
+                        if pending.strip(): self._handle_ffmpeg_line(pending, first_progress)
+                        pending = ""
+                    continue
+                if process.poll() is not None: break
+                if f.tell() > checkpoint.FFMPEG_LOG_MAX_BYTES:
+                    os.truncate(log_path, 0); f.seek(0); pending = ""
+                time.sleep(0.5)
+
+    def _handle_ffmpeg_line(self, line, first_progress=None):
+        if first_progress is not None and not first_progress.is_set() and ("frame=" in line or "size=" in line):
+            first_progress.set()
+        self.log_message("DEBUG", f"[FFmpeg] {line.strip()}")
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         profile_path = sys.argv[1]
         if not os.path.isdir(profile_path):
             print(f"FATAL: Profile path '{profile_path}' not found.")
             sys.exit(1)
-        streamer = Streamer(profile_path=profile_path)
+        initial_delay = 0
+        for arg in sys.argv[2:]:
+            if arg.startswith("--initial-delay="): initial_delay = float(arg.split("=", 1)[1])
+        streamer = Streamer(profile_path=profile_path, initial_delay=initial_delay)
+        if sys.platform != 'win32':
+            signal.signal(signal.SIGTERM, streamer._handle_sigterm)
+            signal.signal(supervisor.DETACH_SIGNAL, streamer._handle_detach)
         streamer.run()
     else:
         print("FATAL: No profile path provided. This script should be launched by manager.py")
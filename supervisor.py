@@ -0,0 +1,301 @@
+# supervisor.py (v1.0 - 进程树监管)
+"""
+工作进程 (streamer.py) 及其子进程 (FFmpeg、Playwright/Chromium) 的监管工具。
+
+  - 每个工作进程都在自己的进程组 (POSIX: 新 session) 中启动，
+    并带上一个唯一的环境变数标记，子孙进程会继承这个标记；
+    即使 Chromium 另开了进程组、或父进程已死被 init 收养，也能凭标记找回。
+  - 启动时在 run/<主播ID>.json 记录 pid、进程启动时间与标记，
+    主控台重启后据此回收上一次残留的 FFmpeg / 浏览器进程。
+  - 停止时对整棵进程树同时发送 SIGTERM，逾时后再 SIGKILL。
+
+进程树的枚举与孤儿回收依赖 /proc (Linux)；Windows 上改用 taskkill /T。
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+RUN_DIR = os.path.join(script_dir, 'run')
+MARKER_ENV = "YTLC_RUN_MARKER"
+# 只有主控台启动的工作进程会在主控台消失时保留 FFmpeg，等待主控台重启后接管；
+# 集群节点等其他启动者消失时，工作进程连同 FFmpeg 一起停止，避免无人监管的推流
+DETACHABLE_ENV = "YTLC_DETACHABLE"
+# 请工作进程退出但保留正在推流的 FFmpeg (见 checkpoint.py)
+DETACH_SIGNAL = getattr(signal, 'SIGUSR1', None)
+# Windows 上没有 /F 的 taskkill 对无视窗的主控台程序通常无效，只等这么多秒就改用 /F
+WINDOWS_TERM_GRACE = 2
+
+HAS_PROC = os.path.isdir('/proc') and sys.platform != 'win32'
+
+
+def new_marker() -> str:
+    return uuid.uuid4().hex
+
+
+def worker_env(marker: str, detachable: bool = False) -> dict:
+    env = os.environ.copy()
+    env[MARKER_ENV] = marker
+    if detachable: env[DETACHABLE_ENV] = "1"
+    else: env.pop(DETACHABLE_ENV, None)
+    return env
+
+
+def popen_kwargs() -> dict:
+    """让工作进程在独立的进程组中启动。"""
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+# ====================================================================
+#                           /proc 工具
+# ====================================================================
+def scan_processes() -> dict:
+    """返回 {pid: (ppid, pgrp, starttime, state)}，僵尸进程不列入。"""
+    table = {}
+    if not HAS_PROC: return table
+    for name in os.listdir('/proc'):
+        if not name.isdigit(): continue
+        try:
+            with open(f'/proc/{name}/stat', 'rb') as f:
+                data = f.read().decode('utf-8', errors='replace')
+        except OSError:
+            continue
+        fields = data[data.rfind(')') + 2:].split()
+        if fields[0] in ('Z', 'X'): continue
+        table[int(name)] = (int(fields[1]), int(fields[2]), int(fields[19]), fields[0])
+    return table
+
+
+def process_start_time(pid: int):
+    if not HAS_PROC: return None
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read().decode('utf-8', errors='replace')
+        return int(data[data.rfind(')') + 2:].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def process_alive(pid: int, start_time=None) -> bool:
+    """进程存活且不是僵尸；指定 start_time 时还须与进程启动时间相符 (排除 pid 被重用)。"""
+    if not HAS_PROC: return False
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read().decode('utf-8', errors='replace')
+    except OSError:
+        return False
+    fields = data[data.rfind(')') + 2:].split()
+    if fields[0] in ('Z', 'X'): return False
+    return start_time is None or int(fields[19]) == start_time
+
+
+def find_marked(markers: set[str]) -> dict:
+    """扫描 /proc/*/environ，返回 {marker: {pid, ...}} (只能读到同一使用者的进程)。"""
+    found = {marker: set() for marker in markers}
+    if not HAS_PROC or not markers: return found
+    prefix = f"{MARKER_ENV}=".encode()
+    for name in os.listdir('/proc'):
+        if not name.isdigit(): continue
+        try:
+            with open(f'/proc/{name}/environ', 'rb') as f:
+                environ = f.read()
+        except OSError:
+            continue
+        start = environ.find(prefix)
+        if start < 0: continue
+        end = environ.find(b'\0', start)
+        marker = environ[start + len(prefix):end if end >= 0 else None].decode('ascii', errors='ignore')
+        if marker in found: found[marker].add(int(name))
+    return found
+
+
+def process_tree(root_pid: int, marker: str | None = None, table: dict | None = None, marked: dict | None = None) -> set[int]:
+    """
+    root_pid 的所有子孙、同进程组成员以及带有相同标记的进程 (含 root 本身，如果仍存活)。
+    一次处理多棵进程树时，可传入 find_marked() 的结果，避免每棵树都重新扫描 /proc/*/environ。
+    """
+    table = scan_processes() if table is None else table
+    pids = {root_pid} if root_pid in table else set()
+    children = {}
+    for pid, (ppid, pgrp, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+        if pgrp == root_pid: pids.add(pid)
+    stack = [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            if child not in pids: pids.add(child); stack.append(child)
+    if marker:
+        marked = find_marked({marker}) if marked is None else marked
+        pids |= marked.get(marker, set()) & table.keys()
+    pids.discard(os.getpid())
+    return pids
+
+# ====================================================================
+#                           停止与回收
+# ====================================================================
+def _signal(pids, sig):
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+
+
+def _taskkill(pid: int, force: bool):
+    command = ["taskkill", "/T", "/PID", str(pid)] + (["/F"] if force else [])
+    subprocess.run(command, capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+
+
+def shutdown_many(entries: list[dict], timeout: float = 10, poll_interval: float = 0.2) -> dict:
+    """
+    同时停止多棵进程树。entries 为 [{'id', 'pid', 'marker', 'process'(可选 Popen),
+    'extra'(可选，一并停止的 pid), 'spare'(可选，保留不动的 pid)}]。
+    先对全部进程发送 SIGTERM，统一等到 timeout，再对仍存活的进程发送 SIGKILL。
+    Windows 上只等 WINDOWS_TERM_GRACE 秒就以 taskkill /F 强制结束。
+    返回 {id: 'stopped' | 'killed'}。
+    """
+    results = {}
+    if not HAS_PROC:
+        if sys.platform == 'win32': timeout = min(timeout, WINDOWS_TERM_GRACE)
+        deadline = time.time() + timeout
+        for entry in entries:
+            if sys.platform == 'win32': _taskkill(entry['pid'], force=False)
+            elif entry.get('process'): entry['process'].terminate()
+        for entry in entries:
+            process = entry.get('process')
+            try:
+                if process: process.wait(timeout=max(0.0, deadline - time.time()))
+                results[entry['id']] = 'stopped'
+            except subprocess.TimeoutExpired:
+                if sys.platform == 'win32': _taskkill(entry['pid'], force=True)
+                else: process.kill()
+                results[entry['id']] = 'killed'
+        return results
+
+    deadline = time.time() + timeout
+    markers = {entry['marker'] for entry in entries if entry.get('marker')}
+
+    def collect_all(table):
+        # 所有进程树共用一次 /proc/*/environ 扫描
+        marked = find_marked(markers)
+        trees = {}
+        for entry in entries:
+            pids = process_tree(entry['pid'], entry.get('marker'), table, marked) | (set(entry.get('extra', ())) & table.keys())
+            trees[entry['id']] = pids - set(entry.get('spare', ()))
+        return trees
+
+    trees = collect_all(scan_processes())
+    for pids in trees.values(): _signal(pids, signal.SIGTERM)
+    remaining = trees
+    while remaining and time.time() < deadline:
+        time.sleep(poll_interval)
+        for entry in entries:
+            if entry.get('process'): entry['process'].poll()  # 回收僵尸
+        alive = scan_processes().keys()
+        remaining = {key: pids & alive for key, pids in remaining.items() if pids & alive}
+    if remaining:
+        # 逾时：重新收集一次进程树 (期间可能产生新的子进程) 后强制结束
+        trees = collect_all(scan_processes())
+        for key, pids in remaining.items(): _signal(pids | trees[key], signal.SIGKILL)
+        for entry in entries:
+            if entry.get('process'):
+                try: entry['process'].wait(timeout=2)
+                except subprocess.TimeoutExpired: pass
+        killed = set().union(*remaining.values())
+        for _ in range(10):
+            if not killed & scan_processes().keys(): break
+            time.sleep(0.1)
+    for entry in entries:
+        results[entry['id']] = 'killed' if entry['id'] in remaining else 'stopped'
+    return results
+
+
+def reap_tree(root_pid: int, marker: str | None, timeout: float = 5, spare=(), extra=()) -> int:
+    """工作进程退出后，清理它遗留的子孙进程与 extra 中的进程 (spare 中的除外)，返回被清理的进程数。"""
+    if not HAS_PROC: return 0
+    table = scan_processes()
+    leftovers = (process_tree(root_pid, marker, table) | set(extra) & table.keys()) - set(spare)
+    if leftovers: shutdown_many([{'id': root_pid, 'pid': root_pid, 'marker': marker, 'spare': spare, 'extra': extra}], timeout)
+    return len(leftovers)
+
+# ====================================================================
+#                           pidfile
+# ====================================================================
+def _pidfile_path(douyin_id: str) -> str:
+    return os.path.join(RUN_DIR, f"{douyin_id}.json")
+
+
+def write_pidfile(douyin_id: str, pid: int, marker: str):
+    os.makedirs(RUN_DIR, exist_ok=True)
+    info = {'douyin_id': douyin_id, 'pid': pid, 'start_time': process_start_time(pid), 'marker': marker,
+            'manager_pid': os.getpid(), 'manager_start_time': process_start_time(os.getpid()), 'created': time.time()}
+    tmp_path = _pidfile_path(douyin_id) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    os.replace(tmp_path, _pidfile_path(douyin_id))
+
+
+def remove_pidfile(douyin_id: str, pid: int | None = None):
+    """删除 pidfile；指定 pid 时只在记录的仍是该进程时才删除 (避免删掉重启后新进程的记录)。"""
+    path = _pidfile_path(douyin_id)
+    try:
+        if pid is not None:
+            with open(path, 'r', encoding='utf-8') as f:
+                if json.load(f).get('pid') != pid: return
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
+
+
+def _read_pidfiles() -> list[dict]:
+    records = []
+    if not os.path.isdir(RUN_DIR): return records
+    for name in os.listdir(RUN_DIR):
+        if not name.endswith('.json'): continue
+        try:
+            with open(os.path.join(RUN_DIR, name), 'r', encoding='utf-8') as f:
+                records.append(json.load(f))
+        except (OSError, ValueError):
+            os.remove(os.path.join(RUN_DIR, name))
+    return records
+
+
+def reap_orphans(timeout: float = 5, spare: dict | None = None) -> dict:
+    """
+    回收上一次运行遗留的进程。只处理记录中的主控台已不存在的条目；
+    以进程启动时间核对 pid，避免误杀被重用 pid 的无关进程。
+    spare 为 {douyin_id: {pid, ...}}，这些进程 (例如待接管的 FFmpeg) 保留不动。
+    返回 {douyin_id: 被回收的进程数}。
+    """
+    spare = spare or {}
+    reaped = {}
+    records = _read_pidfiles()
+    if not HAS_PROC:
+        return reaped
+    table = scan_processes()
+    stale = []
+    for record in records:
+        manager_pid = record.get('manager_pid')
+        if manager_pid != os.getpid() and manager_pid in table and table[manager_pid][2] == record.get('manager_start_time'):
+            continue  # 另一个主控台仍在运行并管理它
+        stale.append(record)
+    marked = find_marked({r['marker'] for r in stale if r.get('marker')})
+    entries = []
+    for record in stale:
+        pid = record.get('pid')
+        pids = set(marked.get(record.get('marker'), set())) & table.keys()
+        if pid in table and table[pid][2] == record.get('start_time'):
+            pids |= process_tree(pid, None, table)
+        kept = set(spare.get(record['douyin_id'], ()))
+        pids -= kept
+        if pids:
+            entries.append({'id': record['douyin_id'], 'pid': pid if pid in pids else next(iter(pids)), 'marker': record.get('marker'), 'spare': kept})
+            reaped[record['douyin_id']] = len(pids)
+        remove_pidfile(record['douyin_id'])
+    if entries: shutdown_many(entries, timeout)
+    return reaped
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+import douyin
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "room_store.json")
+
+
+@pytest.fixture
+def room():
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        chunk = f.read()
+    return douyin.parse_room_store(["self.__pace_f.push([1, \"other\"])", chunk])
+
+
+def test_parse_room_store(room):
+    assert room.status == douyin.ROOM_STATUS_LIVE and room.is_live
+    assert room.title == "测试直播间"
+    assert [q.name for q in room.qualities] == ["origin", "FULL_HD", "HD"]
+    origin, full_hd, hd = room.qualities
+    assert origin.flv_url.endswith("_or4.flv?expire=1") and origin.bitrate_kbps == 6000 and origin.resolution == "1920x1080"
+    assert full_hd.hls_url.endswith("_uhd/index.m3u8") and full_hd.bitrate_kbps == 4000
+    assert hd.flv_url.endswith("_hd.flv?expire=1") and hd.bitrate_kbps == 0
+
+
+def test_parse_room_store_without_room_store():
+    assert douyin.parse_room_store(["<html></html>", '{"roomStore": '] ) is None
+
+
+def test_select_quality_falls_back_to_nearest_higher(room):
+    assert douyin.select_quality(room, "SD").name == "HD"
+    assert douyin.select_quality(room, "SD", max_bitrate_kbps=5000, fallback_kbps=5500).name == "FULL_HD"
+
+
+def test_select_quality_is_case_insensitive(room):
+    assert douyin.select_quality(room, "hd").name == "HD"
+    assert douyin.select_quality(room, "full_hd").name == "FULL_HD"
+
+
+def test_select_quality_estimates_unknown_bitrate(room):
+    assert douyin.select_quality(room, "HD", max_bitrate_kbps=3000, fallback_kbps=4000) is None
+    assert douyin.select_quality(room, "HD", max_bitrate_kbps=3000).name == "HD"
+    assert douyin.select_quality(room, "origin", max_bitrate_kbps=5000, fallback_kbps=4000).name == "FULL_HD"
+
+
+def test_select_quality_accepts_hls_only_room():
+    room = douyin.RoomInfo(status=douyin.ROOM_STATUS_LIVE, qualities=[
+        douyin.StreamQuality(name="HD", hls_url="https://example.com/live_hd/index.m3u8"),
+        douyin.StreamQuality(name="SD", hls_url="https://example.com/live_sd/index.m3u8", flv_url="https://example.com/live_sd.flv"),
+    ])
+    assert room.is_live
+    quality = douyin.select_quality(room, "HD")
+    assert quality.name == "HD" and quality.url.endswith("live_hd/index.m3u8")
+    assert douyin.select_quality(room, "SD").url.endswith("live_sd.flv")